@@ -1,9 +1,17 @@
 
+import functools
 import logging
 import random
 import time
 import json
 import os
+import re
+import select
+import shlex
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from tools import (
     run_command, write_file, read_file, git_init, git_commit,
     git_status, run_tests, detect_project_type, list_dir,
@@ -31,35 +39,81 @@ class AutonomousAgent:
 
     MAX_RETRIES = 3
     IDLE_TIMEOUT = 10  # seconds to wait for input before autonomous cycle
+    MAX_BACKOFF_EXP = 5  # cap for doubling the pause on consecutive failures
 
     def __init__(self, llm_function=None, mode="hybrid"):
         self.project_root = "/projects"
         self.current_goal = None
         self.completed_goals = []
         self.failed_goals = []
+        # Name sets kept alongside the goal lists for O(1) membership checks
+        self._completed_names = set()
+        self._failed_names = set()
+
+        # Pacing between autonomous cycles
+        self._cycle_ewma = 0.0  # smoothed cycle duration (s)
+        self._fail_streak = 0   # consecutive failed goals
+        self._error_streak = 0  # consecutive cycles that raised
         self.mode = mode  # "operator", "autonomous", "hybrid"
+        self.plan_cache_enabled = True  # reuse plans of previously completed goals
 
         self.memory = Memory()
         self.parser = CommandParser(self.project_root)
         self.sanitizer = InputSanitizer()
         self.network = NetworkManager()
 
-        # Initialize LLM engine
-        self.llm_engine = LLMEngine()
-        self.llm = self.llm_engine if self.llm_engine.is_available() else llm_function
+        # Load the LLM engine in the background; templates work meanwhile
+        self._llm_function = llm_function
+        self._llm_engine = None
+        self._llm_resolved = False
+        loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-load")
+        self._llm_future = loader.submit(LLMEngine)
+        loader.shutdown(wait=False)
 
-        # Initialize execution pipeline
-        self.pipeline = ExecutionPipeline(
-            llm=self.llm_engine if self.llm_engine.is_available() else None,
-            memory=self.memory
-        )
+        # Initialize execution pipeline (gets the LLM once it has loaded)
+        self.pipeline = ExecutionPipeline(llm=None, memory=self.memory)
 
         os.makedirs(self.project_root, exist_ok=True)
 
-        if self.llm_engine.is_available():
-            logging.info(f"AGENT: LLM loaded: {self.llm_engine.info()}")
-        else:
-            logging.info("AGENT: No LLM model. Running in template mode.")
+        # Operator input: stdin is registered once with a persistent poller
+        self._input_buffer = b""
+        self._input_eof = False
+        self._input_fd, self._wait_input = self._init_input()
+
+        # Next autonomous goal, picked and set up while the current one runs
+        self._prefetch = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._pending_goal = None  # (goal, staging dir, warm future)
+        # Warmed dirs live here until their goal starts; hidden from the parser's project scan
+        self._staging_root = f"{self.project_root}/.staging"
+
+        logging.info("AGENT: Loading LLM in background. Template mode until ready.")
+
+    @property
+    def llm_engine(self):
+        """The loaded LLMEngine, or None while loading or if no model is usable."""
+        return self._resolve_llm()
+
+    def _resolve_llm(self):
+        """Pick up the background-loaded engine once and wire it into the pipeline."""
+        if not self._llm_resolved and self._llm_future.done():
+            self._llm_resolved = True
+            try:
+                engine = self._llm_future.result()
+            except Exception as e:
+                logging.error(f"AGENT: LLM load failed: {e}")
+                engine = None
+            if engine is not None and engine.is_available():
+                self._llm_engine = engine
+                self.pipeline.llm = engine
+                logging.info(f"AGENT: LLM loaded: {engine.info()}")
+            else:
+                logging.info("AGENT: No LLM model. Running in template mode.")
+        return self._llm_engine
+
+    @property
+    def llm(self):
+        """LLM used for generation: the engine once loaded, else llm_function."""
+        return self.llm_engine or self._llm_function
 
     def start_loop(self):
         """Main execution loop."""
@@ -76,21 +130,72 @@ class AutonomousAgent:
                 else:
                     # Hybrid: check for operator input, fallback to autonomous
                     self._hybrid_cycle()
+                self._error_streak = 0
             except KeyboardInterrupt:
                 logging.info("AGENT: Shutdown signal received.")
+                self.memory.close()
                 break
             except Exception as e:
                 logging.error(f"AGENT: Cycle error: {e}")
                 self.memory.record_action("cycle_error", str(e), success=False)
-                time.sleep(3)
+                self._error_streak += 1
+                time.sleep(3 * 2 ** min(self._error_streak - 1, self.MAX_BACKOFF_EXP))
 
     # --- Operator Mode ---
 
+    def _init_input(self):
+        """
+        Register stdin with an epoll object that is reused every cycle.
+        Returns (fd, wait) where wait(timeout) is truthy once input is
+        readable. Falls back to select() when epoll can't watch stdin
+        (e.g. a regular file).
+        """
+        try:
+            fd = sys.stdin.fileno()
+        except (AttributeError, OSError, ValueError):
+            return None, None
+
+        if hasattr(select, "epoll"):
+            try:
+                poller = select.epoll()
+                try:
+                    poller.register(fd, select.EPOLLIN)
+                    return fd, poller.poll
+                except OSError:
+                    poller.close()
+            except OSError:
+                pass
+
+        fds = [fd]
+        _select = select.select
+        return fd, lambda timeout: _select(fds, (), (), timeout)[0]
+
+    def _read_input(self, timeout=None):
+        """
+        Return the next operator input line, or None if nothing arrived
+        within timeout seconds (or stdin is closed). None timeout blocks.
+        """
+        if self._input_fd is None:
+            return None
+
+        while b"\n" not in self._input_buffer and not self._input_eof:
+            if not self._wait_input(timeout):
+                return None
+            chunk = os.read(self._input_fd, 4096)
+            if not chunk:
+                self._input_eof = True
+                break
+            self._input_buffer += chunk
+
+        if not self._input_buffer:
+            return None
+        line, _, self._input_buffer = self._input_buffer.partition(b"\n")
+        return line.decode("utf-8", errors="replace").strip()
+
     def _operator_cycle(self):
         """Wait for and execute operator commands."""
-        try:
-            line = input("")  # Black screen, single input line
-        except EOFError:
+        line = self._read_input()  # Black screen, single input line
+        if line is None:
             time.sleep(1)
             return
 
@@ -102,7 +207,7 @@ class AutonomousAgent:
 
     def _execute_operator_command(self, command):
         """Parse and execute an operator command."""
-        logging.info(f"INPUT: {command}")
+        logging.info("INPUT: %s", command)
         self.memory.record_action("operator_input", command)
 
         plan = self.parser.parse(command)
@@ -110,29 +215,31 @@ class AutonomousAgent:
             logging.warning("PARSE: No actionable plan generated.")
             return
 
-        logging.info(f"PLAN: intent={plan.get('intent')} actions={len(plan.get('actions', []))}")
+        logging.info("PLAN: intent=%s actions=%d", plan.get("intent"), len(plan.get("actions", [])))
 
         # Execute each action in the plan
         for action in plan.get("actions", []):
             tool_name = action.get("tool")
             args = action.get("args", {})
 
-            if tool_name in TOOL_REGISTRY:
-                try:
-                    # Safety check for shell commands
-                    if tool_name == "run" and not self.sanitizer.is_safe_command(args.get("command", "")):
-                        logging.warning(f"BLOCKED: Unsafe command")
-                        continue
-
-                    func = TOOL_REGISTRY[tool_name]
-                    result = func(**args)
-                    logging.info(f"RESULT [{tool_name}]: {str(result)[:300]}")
-                    self.memory.record_action(f"tool:{tool_name}", args, success=True)
-                except Exception as e:
-                    logging.error(f"TOOL ERROR [{tool_name}]: {e}")
-                    self.memory.record_action(f"tool:{tool_name}", args, success=False)
-            else:
-                logging.warning(f"UNKNOWN TOOL: {tool_name}")
+            func = TOOL_REGISTRY.get(tool_name)
+            if func is None:
+                logging.warning("UNKNOWN TOOL: %s", tool_name)
+                continue
+
+            try:
+                # Safety check for shell commands
+                if tool_name == "run" and not self.sanitizer.is_safe_command(args.get("command", "")):
+                    logging.warning("BLOCKED: Unsafe command")
+                    continue
+
+                result = func(**args)
+                # Lazy %-formatting: str(result) is only built if INFO is emitted
+                logging.info("RESULT [%s]: %.300s", tool_name, result)
+                self.memory.record_action(f"tool:{tool_name}", args, success=True)
+            except Exception as e:
+                logging.error("TOOL ERROR [%s]: %s", tool_name, e)
+                self.memory.record_action(f"tool:{tool_name}", args, success=False)
 
         # If plan requires code generation (needs LLM)
         if plan.get("requires_generation"):
@@ -146,13 +253,17 @@ class AutonomousAgent:
         description = plan.get("description", plan.get("feature", intent))
 
         if self.llm:
-            # TODO: Use LLM to generate code for the task
-            pass
+            goal = {"name": name, "description": description}
+            if self.plan_cache_enabled:
+                cached = self.memory.lookup_plan(description)
+                if cached:
+                    goal["plan"] = cached
+            self._execute_goal(goal, path)
         else:
             # Use template-based generation
-            goal = self._find_matching_template(description)
-            if goal:
-                goal["name"] = name
+            template = self._find_matching_template(description)
+            if template:
+                goal = {**template, "name": name}
                 self._execute_goal(goal, path)
             else:
                 logging.info(f"GENERATE: No template for '{description}', creating skeleton")
@@ -162,22 +273,15 @@ class AutonomousAgent:
 
     def _hybrid_cycle(self):
         """Check for operator input with timeout, fallback to autonomous."""
-        import select
-        import sys
-
-        # Try non-blocking input read
         try:
-            # For Linux terminal: use select for non-blocking I/O
-            if hasattr(select, 'select'):
-                readable, _, _ = select.select([sys.stdin], [], [], self.IDLE_TIMEOUT)
-                if readable:
-                    line = sys.stdin.readline().strip()
-                    if line:
-                        line = self.sanitizer.sanitize_input(line)
-                        self._execute_operator_command(line)
-                        return
+            line = self._read_input(self.IDLE_TIMEOUT)
         except (OSError, ValueError):
-            pass
+            line = None
+
+        if line:
+            line = self.sanitizer.sanitize_input(line)
+            self._execute_operator_command(line)
+            return
 
         # No operator input -> run autonomous cycle
         self._autonomous_cycle()
@@ -186,56 +290,143 @@ class AutonomousAgent:
 
     def _autonomous_cycle(self):
         """Generate and execute a goal autonomously using the execution pipeline."""
+        started = time.monotonic()
         if not self.current_goal:
-            self.current_goal = self._generate_goal()
+            self.current_goal = self._take_pending_goal() or self._generate_goal()
             logging.info(f"GOAL: {self.current_goal['description']}")
 
         name = self.current_goal["name"]
         path = f"{self.project_root}/{name}"
 
+        # Predict the following goal and warm its project dir in the background
+        self._speculate_next_goal(exclude={name})
+
+        success = self._execute_goal(self.current_goal, path)
+        self.memory.record_template_result(name, success)
+        if success:
+            self.completed_goals.append(self.current_goal)
+            self._completed_names.add(name)
+        else:
+            self.failed_goals.append(self.current_goal)
+            self._failed_names.add(name)
+
+        self.current_goal = None
+
+        duration = time.monotonic() - started
+        self._cycle_ewma = 0.7 * self._cycle_ewma + 0.3 * duration if self._cycle_ewma else duration
+        self._fail_streak = 0 if success else self._fail_streak + 1
+        time.sleep(self._cycle_delay())
+
+    def _cycle_delay(self):
+        """Pause after an autonomous cycle, from the recent cycle time and failures."""
+        return self._delay_after(self._cycle_ewma, self._fail_streak)
+
+    @classmethod
+    def _delay_after(cls, cycle_ewma, fail_streak):
+        """
+        2s after an instant cycle, shrinking toward 0.1s as the recent cycle
+        time grows (a slow cycle needs no extra idle time), doubled for each
+        consecutive failure.
+
+        >>> [AutonomousAgent._delay_after(t, 0) for t in (0, 1, 19, 60)]
+        [2.0, 1.0, 0.1, 0.1]
+        >>> AutonomousAgent._delay_after(1, 2)
+        4.0
+        """
+        delay = max(0.1, min(2.0, 2.0 / (1.0 + cycle_ewma)))
+        return delay * 2 ** min(fail_streak, cls.MAX_BACKOFF_EXP)
+
+    def _execute_goal(self, goal, path):
+        """
+        Run a goal through the execution pipeline and record the outcome.
+        Returns True if the pipeline succeeded.
+        """
+        name = goal["name"]
+        self._resolve_llm()
+
         # Register project in memory
-        if not os.path.exists(path):
-            self.memory.register_project(name, path, self.current_goal["description"])
+        if self.memory.get_project(name) is None:
+            self.memory.register_project(name, path, goal["description"])
 
         # Execute through pipeline (handles setup, codegen, test, repair, commit)
-        success, report = self.pipeline.execute_goal(self.current_goal, path)
-
-        # Log pipeline report
-        for stage in report.get("stages", []):
-            status = stage.get("status", "?")
-            sname = stage.get("name", "?")
-            detail = stage.get("detail", "")[:100]
-            logging.info(f"  [{status.upper()}] {sname}: {detail}")
+        success, _ = self.pipeline.execute_goal(goal, path)
 
+        # Stages are logged by the pipeline as they complete
         if success:
             logging.info(f"COMPLETE: {name}")
-            self.completed_goals.append(self.current_goal)
             self.memory.record_success(
-                self.current_goal["description"],
-                list(self.current_goal.get("files", {}).keys())
+                goal["description"],
+                list(goal.get("files", {}).keys())
             )
             self.memory.update_project(name, test_pass=True)
+            # Cache LLM-generated plans so recurring goals skip planning
+            if self.plan_cache_enabled and "plan" in goal:
+                self.memory.cache_plan(goal["description"], goal["plan"])
         else:
             logging.warning(f"FAILED: {name}")
-            self.failed_goals.append(self.current_goal)
             self.memory.record_failure(
-                self.current_goal["description"],
-                list(self.current_goal.get("files", {}).keys()),
+                goal["description"],
+                list(goal.get("files", {}).keys()),
                 "Pipeline failed"
             )
+        return success
 
-        self.current_goal = None
-        time.sleep(2)
-
-    def _generate_goal(self):
-        """Generate the next development goal."""
+    def _speculate_next_goal(self, exclude):
+        """Draw the next goal now and create its project dir off-thread."""
+        if self._pending_goal is not None:
+            return
+        goal = self._generate_goal(exclude=exclude, speculative=True)
+        if goal:
+            staging = f"{self._staging_root}/{goal['name']}"
+            self._pending_goal = (goal, staging, self._prefetch.submit(self._warm_goal, staging))
+
+    @staticmethod
+    def _warm_goal(staging):
+        """Pre-create a goal's directory and repository in the staging area."""
+        shutil.rmtree(staging, ignore_errors=True)  # left over from an earlier run
+        make_dir(staging)
+        git_init(staging)
+
+    def _take_pending_goal(self):
+        """
+        Return the speculated goal if it is still a valid next pick, moving
+        its warmed dir into the project root; a discarded one is removed.
+        """
+        if self._pending_goal is None:
+            return None
+        goal, staging, warm = self._pending_goal
+        self._pending_goal = None
+        try:
+            warm.result()
+        except Exception as e:
+            logging.warning(f"PREFETCH: Warm-up failed: {e}")
+
+        path = f"{self.project_root}/{goal['name']}"
+        if goal["name"] in self._completed_names or goal["name"] in self._failed_names:
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+        if os.path.exists(path):
+            shutil.rmtree(staging, ignore_errors=True)
+        else:
+            try:
+                os.rename(staging, path)
+            except OSError as e:
+                logging.warning(f"PREFETCH: Could not move warmed dir into place: {e}")
+        return goal
+
+    def _generate_goal(self, exclude=frozenset(), speculative=False):
+        """
+        Generate the next development goal.
+        A speculative draw skips names in exclude and leaves the
+        completed/failed lists untouched; it may return None.
+        """
         if self.llm:
             # TODO: Query LLM for dynamic goal
             pass
 
         # Avoid repeating completed goals
-        completed_names = {g["name"] for g in self.completed_goals}
-        failed_names = {g["name"] for g in self.failed_goals}
+        completed_names = self._completed_names | exclude if exclude else self._completed_names
+        failed_names = self._failed_names
 
         available = [
             g for g in PROJECT_TEMPLATES
@@ -244,7 +435,9 @@ class AutonomousAgent:
 
         if not available:
             # All templates done, reset failed list and try again
-            self.failed_goals.clear()
+            if not speculative:
+                self.failed_goals.clear()
+                self._failed_names = set()
             available = [g for g in PROJECT_TEMPLATES if g["name"] not in completed_names]
 
         if not available:
@@ -256,28 +449,58 @@ class AutonomousAgent:
 
         if not available:
             # Everything completed, reset and start over
+            available = PROJECT_TEMPLATES + PROJECT_TEMPLATES_ADVANCED + TEMPLATES_SYSTEM
+            if speculative:
+                available = [g for g in available if g["name"] not in exclude]
+                return self._pick_goal(available) if available else None
             self.completed_goals.clear()
             self.failed_goals.clear()
-            available = PROJECT_TEMPLATES + PROJECT_TEMPLATES_ADVANCED + TEMPLATES_SYSTEM
-
-        return random.choice(available)
+            self._completed_names = set()
+            self._failed_names = set()
+
+        return self._pick_goal(available)
+
+    def _pick_goal(self, available):
+        """
+        Weighted draw over candidate goals. Templates that pass the pipeline
+        more often, and whose keywords overlap recent operator input
+        (Jaccard), are more likely to be picked.
+        """
+        stats = self.memory.get_template_stats()
+        recent_words = set(re.findall(r"[a-z0-9]+", " ".join(self.memory.recent_inputs()).lower()))
+
+        weights = []
+        for goal in available:
+            ok, fail = stats.get(goal["name"], (0, 0))
+            weight = (ok + 1) / (ok + fail + 2)
+            if recent_words:
+                keywords = set(goal.get("keywords", ()))
+                weight *= 1 + len(keywords & recent_words) / len(keywords | recent_words)
+            weights.append(weight)
+
+        return random.choices(available, weights=weights, k=1)[0]
 
     def _find_matching_template(self, description):
-        """Find a template that matches a description."""
-        desc_lower = description.lower()
-        all_templates = PROJECT_TEMPLATES + PROJECT_TEMPLATES_ADVANCED + TEMPLATES_SYSTEM
-        for template in all_templates:
-            if any(kw in desc_lower for kw in template.get("keywords", [])):
-                return dict(template)
-        return None
+        """Find a template that matches a description (read-only view)."""
+        index = _match_template_index(description.lower())
+        if index is None:
+            return None
+        return _ALL_TEMPLATES[index]
 
     def _create_skeleton_project(self, name, path, description):
         """Create a minimal skeleton project."""
-        make_dir(path)
-        git_init(path)
+        # write_file creates the directory
         write_file(f"{path}/main.py", f'#!/usr/bin/env python3\n"""{description}"""\n\ndef main():\n    pass\n\nif __name__ == "__main__":\n    main()\n')
         write_file(f"{path}/README.md", f"# {name}\n\n{description}\n")
-        git_commit(path, f"init: {name} skeleton")
+
+        # Init (if needed), stage and commit in a single shell invocation
+        steps = [] if os.path.isdir(f"{path}/.git") else ["git -c init.defaultBranch=main init -q"]
+        steps.append("git add -A")
+        steps.append(
+            "git -c user.email=devos@autonomous.local -c user.name=DevOS-Agent "
+            f"commit -q -m {shlex.quote(f'init: {name} skeleton')}"
+        )
+        run_command(" && ".join(steps), cwd=path)
         self.memory.register_project(name, path, description)
 
 
@@ -330,17 +553,25 @@ if __name__ == "__main__":
         "files": {
             "parser.py": '''#!/usr/bin/env python3
 """Minimal recursive-descent JSON parser."""
+import json
+import re
+import sys
+
+_WS = re.compile(r'[ \\t\\n\\r]*')
+_STR_RUN = re.compile(r'[^"\\\\]*')
+_ESCAPES = {'n': '\\n', 't': '\\t', 'r': '\\r', '"': '"', '\\\\': '\\\\'}
+_NUM = re.compile(r'-?[0-9]+(\\.[0-9]+)?([eE][-+]?[0-9]+)?')
 
 class JSONParser:
     def __init__(self, text):
         self.text = text
         self.pos = 0
+        self._n = len(text)
 
     def parse(self):
-        self._skip_ws()
         result = self._parse_value()
         self._skip_ws()
-        if self.pos < len(self.text):
+        if self.pos < self._n:
             raise ValueError(f"Unexpected char at {self.pos}")
         return result
 
@@ -358,29 +589,40 @@ class JSONParser:
 
     def _parse_string(self):
         self._expect('"')
+        # Hot loop works on locals; self.pos is written back on exit
+        text, pos, n = self.text, self.pos, self._n
+        match_run = _STR_RUN.match
+        escapes = _ESCAPES
         result = []
-        while self._peek() != '"':
-            ch = self._advance()
-            if ch == '\\\\':
-                esc = self._advance()
-                escapes = {'n': '\\n', 't': '\\t', 'r': '\\r', '"': '"', '\\\\': '\\\\'}
-                result.append(escapes.get(esc, esc))
-            else:
-                result.append(ch)
-        self._expect('"')
-        return ''.join(result)
+        append = result.append
+        while True:
+            # Copy the run up to the next quote or backslash in one slice
+            end = match_run(text, pos).end()
+            if end >= n:
+                raise ValueError("Unterminated string")
+            if text[end] == '"':
+                self.pos = end + 1
+                if not result:
+                    return text[pos:end]  # no escapes: a single slice, no join
+                append(text[pos:end])
+                return ''.join(result)
+            append(text[pos:end])
+            if end + 1 >= n:
+                raise ValueError("Unterminated string")
+            esc = text[end + 1]
+            append(escapes.get(esc, esc))
+            pos = end + 2
 
     def _parse_number(self):
-        start = self.pos
-        if self._peek() == '-': self._advance()
-        while self.pos < len(self.text) and self.text[self.pos].isdigit():
-            self._advance()
-        if self.pos < len(self.text) and self.text[self.pos] == '.':
-            self._advance()
-            while self.pos < len(self.text) and self.text[self.pos].isdigit():
-                self._advance()
-            return float(self.text[start:self.pos])
-        return int(self.text[start:self.pos])
+        # Whole lexeme in one match; fraction or exponent makes it a float
+        m = _NUM.match(self.text, self.pos)
+        if not m:
+            raise ValueError(f"Invalid number at {self.pos}")
+        self.pos = m.end()
+        lexeme = m.group()
+        if m.group(1) or m.group(2):
+            return float(lexeme)
+        return int(lexeme)
 
     def _parse_object(self):
         self._expect('{')
@@ -391,6 +633,7 @@ class JSONParser:
             self._skip_ws()
             self._expect(':')
             obj[key] = self._parse_value()
+            self._skip_ws()
             while self._peek() == ',':
                 self._advance()
                 self._skip_ws()
@@ -398,6 +641,7 @@ class JSONParser:
                 self._skip_ws()
                 self._expect(':')
                 obj[key] = self._parse_value()
+                self._skip_ws()
         self._expect('}')
         return obj
 
@@ -407,9 +651,11 @@ class JSONParser:
         self._skip_ws()
         if self._peek() != ']':
             arr.append(self._parse_value())
+            self._skip_ws()
             while self._peek() == ',':
                 self._advance()
                 arr.append(self._parse_value())
+                self._skip_ws()
         self._expect(']')
         return arr
 
@@ -419,75 +665,95 @@ class JSONParser:
                 raise ValueError(f"Expected '{expected}'")
         return value
 
+    # Whitespace is skipped by callers, once after each token: _peek,
+    # _advance and _expect read the current position as-is.
+
     def _peek(self):
-        self._skip_ws()
-        if self.pos >= len(self.text):
+        if self.pos >= self._n:
             raise ValueError("Unexpected end of input")
         return self.text[self.pos]
 
     def _advance(self):
+        if self.pos >= self._n:
+            raise ValueError("Unexpected end of input")
         ch = self.text[self.pos]
         self.pos += 1
         return ch
 
     def _expect(self, ch):
-        self._skip_ws()
         if self._advance() != ch:
             raise ValueError(f"Expected '{ch}' at {self.pos-1}")
 
     def _skip_ws(self):
-        while self.pos < len(self.text) and self.text[self.pos] in ' \\t\\n\\r':
-            self.pos += 1
+        # Most calls land on a non-space char; longer runs are scanned in C
+        text, pos = self.text, self.pos
+        if pos < self._n and text[pos] in ' \\t\\n\\r':
+            self.pos = _WS.match(text, pos).end()
 
 
-def parse_json(text):
-    return JSONParser(text).parse()
+def parse_json(text, slow=False):
+    """Parse with the stdlib C parser; slow=True runs the from-scratch JSONParser."""
+    if slow:
+        return JSONParser(text).parse()
+    return json.loads(text)
 
 
 if __name__ == "__main__":
     test = '{"name": "DevOS", "version": 1, "features": ["autonomous", "offline"]}'
-    print(parse_json(test))
+    print(parse_json(test, slow="--slow" in sys.argv))
 ''',
             "test_parser.py": '''#!/usr/bin/env python3
 import unittest
 from parser import parse_json
 
 class TestJSONParser(unittest.TestCase):
+    def parse(self, text):
+        return parse_json(text)
+
     def test_string(self):
-        self.assertEqual(parse_json('"hello"'), "hello")
+        self.assertEqual(self.parse('"hello"'), "hello")
 
     def test_number_int(self):
-        self.assertEqual(parse_json('42'), 42)
+        self.assertEqual(self.parse('42'), 42)
 
     def test_number_float(self):
-        self.assertAlmostEqual(parse_json('3.14'), 3.14)
+        self.assertAlmostEqual(self.parse('3.14'), 3.14)
 
     def test_negative(self):
-        self.assertEqual(parse_json('-7'), -7)
+        self.assertEqual(self.parse('-7'), -7)
 
     def test_boolean(self):
-        self.assertTrue(parse_json('true'))
-        self.assertFalse(parse_json('false'))
+        self.assertTrue(self.parse('true'))
+        self.assertFalse(self.parse('false'))
 
     def test_null(self):
-        self.assertIsNone(parse_json('null'))
+        self.assertIsNone(self.parse('null'))
 
     def test_array(self):
-        self.assertEqual(parse_json('[1, 2, 3]'), [1, 2, 3])
+        self.assertEqual(self.parse('[1, 2, 3]'), [1, 2, 3])
 
     def test_object(self):
-        result = parse_json('{"a": 1, "b": "two"}')
+        result = self.parse('{"a": 1, "b": "two"}')
         self.assertEqual(result, {"a": 1, "b": "two"})
 
     def test_nested(self):
-        result = parse_json('{"data": [1, {"x": true}]}')
+        result = self.parse('{"data": [1, {"x": true}]}')
         self.assertEqual(result, {"data": [1, {"x": True}]})
 
     def test_empty_object(self):
-        self.assertEqual(parse_json('{}'), {})
+        self.assertEqual(self.parse('{}'), {})
 
     def test_empty_array(self):
-        self.assertEqual(parse_json('[]'), [])
+        self.assertEqual(self.parse('[]'), [])
+
+class TestJSONParserSlow(TestJSONParser):
+    """Same cases through the from-scratch parser."""
+    def parse(self, text):
+        return parse_json(text, slow=True)
+
+    def test_matches_fast_path(self):
+        doc = '{"s": "a b\\\\"c", "n": [-1, 2.5, 0], "o": {"t": true, "f": null}}'
+        self.assertEqual(self.parse(doc), parse_json(doc))
 
 if __name__ == "__main__":
     unittest.main()
@@ -503,21 +769,25 @@ if __name__ == "__main__":
             "server.py": '''#!/usr/bin/env python3
 """Minimal HTTP server with routing support."""
 import json
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 routes = {}
 
-def route(path, method="GET"):
+_encode = json.JSONEncoder(separators=(",", ":")).encode
+NOT_FOUND_BODY = _encode({"error": "not found"}).encode()
+
+def route(path, method="GET", static=False):
+    """Register a handler. A static handler's output is encoded once, here."""
     def decorator(func):
-        routes[(method, path)] = func
+        routes[(method, path)] = _encode(func(None)).encode() if static else func
         return func
     return decorator
 
-@route("/", "GET")
+@route("/", "GET", static=True)
 def index(handler):
     return {"message": "DevOS HTTP Server", "status": "running"}
 
-@route("/health", "GET")
+@route("/health", "GET", static=True)
 def health(handler):
     return {"status": "ok"}
 
@@ -528,19 +798,26 @@ def echo(handler):
     return {"echo": body}
 
 class Handler(BaseHTTPRequestHandler):
+    # Buffered wfile: headers and body go out together on the flush that
+    # handle_one_request does after each request; larger bodies bypass the buffer
+    wbufsize = 64 * 1024
+
     def do_GET(self): self._handle("GET")
     def do_POST(self): self._handle("POST")
 
     def _handle(self, method):
-        key = (method, self.path)
-        if key in routes:
-            result = routes[key](self)
-            self._send(200, result)
+        target = routes.get((method, self.path))
+        if target is None:
+            self._send_body(404, NOT_FOUND_BODY)
+        elif callable(target):
+            self._send(200, target(self))
         else:
-            self._send(404, {"error": "not found"})
+            self._send_body(200, target)
 
     def _send(self, code, data):
-        body = json.dumps(data).encode()
+        self._send_body(code, _encode(data).encode())
+
+    def _send_body(self, code, body):
         self.send_response(code)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", len(body))
@@ -551,7 +828,7 @@ class Handler(BaseHTTPRequestHandler):
 
 if __name__ == "__main__":
     port = 8080
-    httpd = HTTPServer(("", port), Handler)
+    httpd = ThreadingHTTPServer(("", port), Handler)
     print(f"Listening on :{port}")
     httpd.serve_forever()
 ''',
@@ -561,13 +838,13 @@ import threading
 import json
 import http.client
 import time
-from server import HTTPServer, Handler
+from server import ThreadingHTTPServer, Handler
 
 class TestHTTPServer(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         cls.port = 19876
-        cls.server = HTTPServer(("", cls.port), Handler)
+        cls.server = ThreadingHTTPServer(("", cls.port), Handler)
         cls.thread = threading.Thread(target=cls.server.serve_forever)
         cls.thread.daemon = True
         cls.thread.start()
@@ -617,6 +894,7 @@ import json
 import os
 
 DB_FILE = os.path.join(os.path.dirname(__file__), "todos.json")
+PRETTY = False  # set by --pretty; compact output otherwise
 
 def load():
     if os.path.exists(DB_FILE):
@@ -626,7 +904,10 @@ def load():
 
 def save(todos):
     with open(DB_FILE, 'w') as f:
-        json.dump(todos, f, indent=2)
+        if PRETTY:
+            json.dump(todos, f, indent=2)
+        else:
+            json.dump(todos, f, separators=(",", ":"))
 
 def add(text):
     todos = load()
@@ -660,20 +941,25 @@ def show():
         print(f"  [{mark}] {t['id']}: {t['text']}")
 
 def main():
-    if len(sys.argv) < 2:
+    global PRETTY
+    args = sys.argv[1:]
+    if "--pretty" in args:
+        args.remove("--pretty")
+        PRETTY = True
+    if not args:
         show()
         return
-    cmd = sys.argv[1]
-    if cmd == "add" and len(sys.argv) > 2:
-        add(" ".join(sys.argv[2:]))
-    elif cmd == "done" and len(sys.argv) > 2:
-        done(int(sys.argv[2]))
-    elif cmd == "rm" and len(sys.argv) > 2:
-        remove(int(sys.argv[2]))
+    cmd = args[0]
+    if cmd == "add" and len(args) > 1:
+        add(" ".join(args[1:]))
+    elif cmd == "done" and len(args) > 1:
+        done(int(args[1]))
+    elif cmd == "rm" and len(args) > 1:
+        remove(int(args[1]))
     elif cmd == "list":
         show()
     else:
-        print(f"Usage: todo.py [add|done|rm|list] [args]")
+        print(f"Usage: todo.py [--pretty] [add|done|rm|list] [args]")
 
 if __name__ == "__main__":
     main()
@@ -742,49 +1028,57 @@ from collections import Counter
 
 class LogAnalyzer:
     LEVELS = ["TRACE", "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL", "FATAL"]
+    ERROR_LEVELS = frozenset({"ERROR", "CRITICAL", "FATAL"})
+    MAX_ERRORS = 1000  # error entries kept for the report; all are counted
+    # One entry per line; [ \\t] instead of \\s so a match never crosses lines
     PATTERN = re.compile(
-        r"(\\d{4}-\\d{2}-\\d{2}[T ]\\d{2}:\\d{2}:\\d{2})?\\s*"
-        r"\\[?(TRACE|DEBUG|INFO|WARN(?:ING)?|ERROR|CRITICAL|FATAL)\\]?\\s*:?\\s*(.*)",
-        re.IGNORECASE
+        r"^[ \\t]*(\\d{4}-\\d{2}-\\d{2}[T ]\\d{2}:\\d{2}:\\d{2})?[ \\t]*"
+        r"\\[?(TRACE|DEBUG|INFO|WARN(?:ING)?|ERROR|CRITICAL|FATAL)\\]?[ \\t]*:?[ \\t]*(.*)",
+        re.IGNORECASE | re.MULTILINE
     )
 
     def __init__(self):
-        self.entries = []
+        self.total = 0
         self.level_counts = Counter()
         self.errors = []
+        self.error_count = 0
 
     def parse_file(self, filepath):
         with open(filepath) as f:
-            for line_no, line in enumerate(f, 1):
-                self._parse_line(line.strip(), line_no)
+            self._scan(f.read())
         return self
 
     def parse_text(self, text):
-        for line_no, line in enumerate(text.strip().split("\\n"), 1):
-            self._parse_line(line.strip(), line_no)
+        self._scan(text.strip())
         return self
 
-    def _parse_line(self, line, line_no):
-        if not line:
-            return
-        match = self.PATTERN.match(line)
-        if match:
-            timestamp = match.group(1) or ""
-            level = match.group(2).upper()
+    def _scan(self, text):
+        """Match all log lines of a blob in a single finditer pass."""
+        errors = self.errors
+        error_levels = self.ERROR_LEVELS
+        levels = []
+        line_no, last = 1, 0
+        for match in self.PATTERN.finditer(text):
+            timestamp, level, message = match.groups()
+            level = level.upper()
             if level == "WARN":
                 level = "WARNING"
-            message = match.group(3).strip()
-            entry = {"line": line_no, "timestamp": timestamp, "level": level, "message": message}
-            self.entries.append(entry)
-            self.level_counts[level] += 1
-            if level in ("ERROR", "CRITICAL", "FATAL"):
-                self.errors.append(entry)
+            levels.append(level)
+            if level in error_levels:
+                self.error_count += 1
+                if len(errors) < self.MAX_ERRORS:
+                    start = match.start()
+                    line_no += text.count("\\n", last, start)
+                    last = start
+                    errors.append({"line": line_no, "timestamp": timestamp or "", "level": level, "message": message.strip()})
+        self.total += len(levels)
+        self.level_counts.update(levels)
 
     def report(self):
         return {
-            "total_lines": len(self.entries),
+            "total_lines": self.total,
             "level_distribution": dict(self.level_counts),
-            "error_count": len(self.errors),
+            "error_count": self.error_count,
             "errors": [{"line": e["line"], "message": e["message"][:100]} for e in self.errors[:20]],
         }
 
@@ -832,7 +1126,7 @@ class TestLogAnalyzer(unittest.TestCase):
         self.analyzer = LogAnalyzer().parse_text(SAMPLE_LOG)
 
     def test_total_entries(self):
-        self.assertEqual(len(self.analyzer.entries), 6)
+        self.assertEqual(self.analyzer.report()["total_lines"], 6)
 
     def test_error_count(self):
         self.assertEqual(len(self.analyzer.errors), 2)
@@ -865,28 +1159,44 @@ import hashlib
 import os
 import json
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 HASH_DB = "checksums.json"
+CHUNK_SIZE = 1 << 20
 
 def hash_file(filepath):
-    sha = hashlib.sha256()
     with open(filepath, 'rb') as f:
-        for chunk in iter(lambda: f.read(8192), b''):
-            sha.update(chunk)
-    return sha.hexdigest()
+        # Python 3.11+: the read/update loop runs in C
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        sha = hashlib.sha256()
+        buf = bytearray(CHUNK_SIZE)
+        view = memoryview(buf)
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            sha.update(view[:n])
+        return sha.hexdigest()
 
 def hash_directory(dirpath):
-    results = {}
+    rels, paths = [], []
     for root, dirs, files in os.walk(dirpath):
         for fname in sorted(files):
             fpath = os.path.join(root, fname)
-            rel = os.path.relpath(fpath, dirpath)
-            results[rel] = hash_file(fpath)
-    return results
-
-def save_checksums(checksums, db_path=HASH_DB):
+            rels.append(os.path.relpath(fpath, dirpath))
+            paths.append(fpath)
+    # hashlib releases the GIL, so threads scale; DEVOS_HASH_PROCS=1 uses processes
+    pool = ProcessPoolExecutor if os.environ.get("DEVOS_HASH_PROCS") == "1" else ThreadPoolExecutor
+    with pool() as ex:
+        return dict(zip(rels, ex.map(hash_file, paths)))
+
+def save_checksums(checksums, db_path=HASH_DB, pretty=False):
     with open(db_path, 'w') as f:
-        json.dump(checksums, f, indent=2)
+        if pretty:
+            json.dump(checksums, f, indent=2)
+        else:
+            json.dump(checksums, f, separators=(",", ":"))
 
 def load_checksums(db_path=HASH_DB):
     if os.path.exists(db_path):
@@ -912,14 +1222,18 @@ def verify(dirpath, db_path=HASH_DB):
     return report
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: hasher.py [hash|verify] <path>")
+    args = sys.argv[1:]
+    pretty = "--pretty" in args
+    if pretty:
+        args.remove("--pretty")
+    if not args:
+        print("Usage: hasher.py [--pretty] [hash|verify] <path>")
         sys.exit(1)
-    cmd = sys.argv[1]
-    path = sys.argv[2] if len(sys.argv) > 2 else "."
+    cmd = args[0]
+    path = args[1] if len(args) > 1 else "."
     if cmd == "hash":
         checksums = hash_directory(path)
-        save_checksums(checksums)
+        save_checksums(checksums, pretty=pretty)
         print(f"Hashed {len(checksums)} files")
     elif cmd == "verify":
         report = verify(path)
@@ -977,18 +1291,40 @@ if __name__ == "__main__":
         "files": {
             "kvstore.py": '''#!/usr/bin/env python3
 """Thread-safe key-value store with optional disk persistence."""
+import heapq
 import json
 import os
+import pickle
 import threading
 import time
 
+class _PlainUnpickler(pickle.Unpickler):
+    """Refuses every class lookup, so only tuples, dicts, lists, strings and numbers load."""
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"refusing to load {module}.{name}")
+
 class KVStore:
+    # The persist file is an append-only log of pickled operations. It is
+    # rewritten as a snapshot once it holds more than 2x as many records as
+    # live keys. JSON files from older versions are converted on load.
+    # Values must be plain data (as with the old JSON format): the log is read
+    # back with _PlainUnpickler, which will not construct arbitrary objects.
+    COMPACT_MIN_RECORDS = 64
+
     def __init__(self, persist_path=None):
         self._data = {}
+        self._ttl_heap = []  # (expires, key); stale after overwrite or delete
         self._lock = threading.RLock()
         self._persist_path = persist_path
-        if persist_path and os.path.exists(persist_path):
-            self._load()
+        self._log = None
+        self._log_records = 0
+        if persist_path:
+            legacy = os.path.exists(persist_path) and self._load()
+            self._ttl_heap = [(e["expires"], k) for k, e in self._data.items() if "expires" in e]
+            heapq.heapify(self._ttl_heap)
+            self._log = open(persist_path, 'ab')
+            if legacy:
+                self._compact()
 
     def get(self, key, default=None):
         with self._lock:
@@ -1005,14 +1341,15 @@ class KVStore:
             entry = {"value": value, "created": time.time()}
             if ttl:
                 entry["expires"] = time.time() + ttl
+                heapq.heappush(self._ttl_heap, (entry["expires"], key))
             self._data[key] = entry
-            self._save()
+            self._append(("set", key, entry))
 
     def delete(self, key):
         with self._lock:
             if key in self._data:
                 del self._data[key]
-                self._save()
+                self._append(("del", key))
                 return True
             return False
 
@@ -1037,7 +1374,14 @@ class KVStore:
     def clear(self):
         with self._lock:
             self._data.clear()
-            self._save()
+            self._ttl_heap.clear()
+            self._compact()
+
+    def close(self):
+        with self._lock:
+            if self._log:
+                self._log.close()
+                self._log = None
 
     def _is_expired(self, key):
         entry = self._data.get(key)
@@ -1046,18 +1390,58 @@ class KVStore:
         return False
 
     def _cleanup_expired(self):
-        expired = [k for k in self._data if self._is_expired(k)]
-        for k in expired:
-            del self._data[k]
+        heap = self._ttl_heap
+        now = time.time()
+        while heap and heap[0][0] < now:
+            expires, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            if entry and entry.get("expires") == expires:
+                del self._data[key]
 
-    def _save(self):
-        if self._persist_path:
-            with open(self._persist_path, 'w') as f:
-                json.dump(self._data, f)
+    def _append(self, record):
+        if self._log is None:
+            return
+        pickle.dump(record, self._log, pickle.HIGHEST_PROTOCOL)
+        self._log.flush()
+        self._log_records += 1
+        if self._log_records > max(self.COMPACT_MIN_RECORDS, 2 * len(self._data)):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the log as one set record per live key."""
+        if self._log is None:
+            return
+        self._cleanup_expired()
+        tmp_path = self._persist_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            for key, entry in self._data.items():
+                pickle.dump(("set", key, entry), f, pickle.HIGHEST_PROTOCOL)
+        self._log.close()
+        os.replace(tmp_path, self._persist_path)
+        self._log = open(self._persist_path, 'ab')
+        self._log_records = len(self._data)
 
     def _load(self):
-        with open(self._persist_path) as f:
-            self._data = json.load(f)
+        """Replay the log. Returns True if the file was in the old JSON format."""
+        with open(self._persist_path, 'rb') as f:
+            if f.peek(1)[:1] == b'{':
+                self._load_json(f)
+                return True
+            while True:
+                try:
+                    record = _PlainUnpickler(f).load()
+                except (EOFError, pickle.UnpicklingError):
+                    break  # end of log, torn final write or disallowed object
+                if record[0] == "set":
+                    self._data[record[1]] = record[2]
+                else:
+                    self._data.pop(record[1], None)
+                self._log_records += 1
+        return False
+
+    def _load_json(self, f):
+        self._data = json.load(f)  # legacy whole-dict snapshot
+        self._log_records = len(self._data)
 
 if __name__ == "__main__":
     store = KVStore()
@@ -1119,6 +1503,8 @@ PROJECT_TEMPLATES_ADVANCED = [
         "files": {
             "scheduler.py": '''#!/usr/bin/env python3
 """Simple task scheduler with interval-based execution."""
+import heapq
+import itertools
 import time
 import threading
 import logging
@@ -1151,27 +1537,63 @@ class Task:
 class Scheduler:
     def __init__(self):
         self.tasks = {}
+        # Min-heap of (due_time, seq, task). Entries for removed or replaced
+        # tasks are left in place and skipped when they reach the top.
+        self._queue = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
         self._running = False
 
     def add(self, name, func, interval, args=None):
-        self.tasks[name] = Task(name, func, interval, args)
+        task = Task(name, func, interval, args)
+        with self._lock:
+            self.tasks[name] = task
+            self._push(task, task.last_run + interval)
+        self._wakeup.set()
 
     def remove(self, name):
-        self.tasks.pop(name, None)
+        with self._lock:
+            self.tasks.pop(name, None)
 
     def run_once(self):
-        for task in self.tasks.values():
-            if task.is_due():
+        now = time.time()
+        due_tasks = []
+        with self._lock:
+            while True:
+                due = self._next_due()
+                if due is None or due > now:
+                    break
+                due_tasks.append(heapq.heappop(self._queue)[2])
+        for task in due_tasks:
+            if task.enabled:
                 task.execute()
+            with self._lock:
+                if self.tasks.get(task.name) is task:
+                    self._push(task, time.time() + task.interval)
 
     def run_forever(self, tick=1):
+        """Sleep until the next task is due; `tick` caps the wait when idle."""
         self._running = True
         while self._running:
             self.run_once()
-            time.sleep(tick)
+            with self._lock:
+                due = self._next_due()
+            self._wakeup.wait(tick if due is None else max(due - time.time(), 0))
+            self._wakeup.clear()
 
     def stop(self):
         self._running = False
+        self._wakeup.set()
+
+    def _push(self, task, due):
+        heapq.heappush(self._queue, (due, next(self._seq), task))
+
+    def _next_due(self):
+        queue = self._queue
+        while queue and self.tasks.get(queue[0][2].name) is not queue[0][2]:
+            heapq.heappop(queue)
+        return queue[0][0] if queue else None
 
     def status(self):
         return {name: {"runs": t.run_count, "enabled": t.enabled} for name, t in self.tasks.items()}
@@ -1228,19 +1650,32 @@ import os
 import re
 from collections import defaultdict
 
+try:
+    from pyroaring import BitMap as Postings
+except ImportError:
+    Postings = set
+
+_TOKEN_RE = re.compile(rb"[a-z0-9_]+")
+_LOWER = bytes.maketrans(b"ABCDEFGHIJKLMNOPQRSTUVWXYZ", b"abcdefghijklmnopqrstuvwxyz")
+
 class TextIndexer:
     def __init__(self):
-        self.index = defaultdict(set)
+        self.index = defaultdict(Postings)  # term -> posting list of doc ids
         self.documents = {}
+        self.doc_ids = {}
+        self.paths = []
 
     def add_file(self, filepath):
-        with open(filepath) as f:
+        with open(filepath, 'rb') as f:
             content = f.read()
-        doc_id = filepath
-        self.documents[doc_id] = content
-        words = self._tokenize(content)
-        for word in words:
-            self.index[word].add(doc_id)
+        doc_id = self.doc_ids.get(filepath)
+        if doc_id is None:
+            doc_id = self.doc_ids[filepath] = len(self.paths)
+            self.paths.append(filepath)
+        self.documents[filepath] = content
+        index = self.index
+        for word in self._tokenize(content):
+            index[word].add(doc_id)
 
     def add_directory(self, dirpath, extensions=None):
         extensions = extensions or ['.py', '.txt', '.md', '.json', '.sh']
@@ -1250,26 +1685,35 @@ class TextIndexer:
                     self.add_file(os.path.join(root, fname))
 
     def search(self, query):
-        words = self._tokenize(query)
+        words = self._tokenize(query.encode())
         if not words:
             return []
-        result_sets = [self.index.get(w, set()) for w in words]
-        matches = set.intersection(*result_sets) if result_sets else set()
+        result_sets = []
+        for w in words:
+            postings = self.index.get(w)
+            if not postings:
+                return []
+            result_sets.append(postings)
+        result_sets.sort(key=len)
+        matches = result_sets[0].intersection(*result_sets[1:])
         results = []
-        for doc_id in matches:
-            lines = self.documents[doc_id].split("\\n")
+        for doc_id in sorted(matches):
+            path = self.paths[doc_id]
+            lines = self.documents[path].split(b"\\n")
             matching_lines = []
             for i, line in enumerate(lines, 1):
-                if any(w in line.lower() for w in words):
-                    matching_lines.append((i, line.strip()))
-            results.append({"file": doc_id, "matches": matching_lines[:5]})
+                lowered = line.translate(_LOWER)
+                if any(w in lowered for w in words):
+                    matching_lines.append((i, line.strip().decode(errors="replace")))
+            results.append({"file": path, "matches": matching_lines[:5]})
         return results
 
     def stats(self):
         return {"documents": len(self.documents), "terms": len(self.index)}
 
-    def _tokenize(self, text):
-        return list(set(re.findall(r"[a-z0-9_]+", text.lower())))
+    def _tokenize(self, data):
+        """Unique ASCII word tokens of raw bytes, as a set of bytes."""
+        return set(_TOKEN_RE.findall(data.translate(_LOWER)))
 
 if __name__ == "__main__":
     idx = TextIndexer()
@@ -1315,3 +1759,39 @@ if __name__ == "__main__":
         "test_cmd": "python3 -m unittest test_indexer.py -v"
     },
 ]
+
+
+# Shared read-only views; copy before mutating
+PROJECT_TEMPLATES = [MappingProxyType(t) for t in PROJECT_TEMPLATES]
+PROJECT_TEMPLATES_ADVANCED = [MappingProxyType(t) for t in PROJECT_TEMPLATES_ADVANCED]
+
+
+# ============================================================
+# TEMPLATE KEYWORD INDEX
+# Built once at import; maps keyword -> indices into _ALL_TEMPLATES
+# ============================================================
+
+_ALL_TEMPLATES = tuple(PROJECT_TEMPLATES + PROJECT_TEMPLATES_ADVANCED + TEMPLATES_SYSTEM)
+
+_KEYWORD_INDEX = {}
+for _i, _template in enumerate(_ALL_TEMPLATES):
+    for _kw in _template.get("keywords", []):
+        _KEYWORD_INDEX.setdefault(_kw.lower(), []).append(_i)
+del _i, _template, _kw
+
+_MAX_KEYWORD_LEN = max(map(len, _KEYWORD_INDEX))
+
+
+@functools.lru_cache(maxsize=512)
+def _match_template_index(desc_lower):
+    """
+    Index of the first template with a keyword starting any word of the
+    description ("parsers" matches "parse"), or None.
+    """
+    best = None
+    for word in set(re.findall(r"[a-z0-9]+", desc_lower)):
+        for end in range(1, min(len(word), _MAX_KEYWORD_LEN) + 1):
+            hits = _KEYWORD_INDEX.get(word[:end])
+            if hits and (best is None or hits[0] < best):
+                best = hits[0]
+    return best
@@ -3,12 +3,27 @@ import re
 import os
 import logging
 import json
-from tools import TOOL_REGISTRY, run_command, write_file, read_file, git_init, git_commit, run_tests
+import time
+from collections import OrderedDict
+
+try:
+    import orjson
+    _json_loads = orjson.loads  # raises a json.JSONDecodeError subclass
+except ImportError:
+    _json_loads = json.loads
 
 # Command parser: converts operator imperative commands into tool invocations.
 # Supports both Turkish and English commands.
 # No questions. No clarification. Infer defaults and execute.
 
+# How long a cached latest-project lookup stays valid. The cache is also
+# dropped as soon as a project is added or removed (project root mtime),
+# but writes inside an existing project only show up after this.
+LATEST_PROJECT_TTL = 5.0
+
+# Recent inputs whose intent match is remembered by CommandParser
+PARSE_CACHE_SIZE = 128
+
 # Intent mapping: keyword patterns -> action plans
 INTENT_PATTERNS = [
     # Project creation
@@ -104,19 +119,244 @@ INTENT_PATTERNS = [
     # Raw shell command (fallback for direct commands)
     {
         "patterns": [
-            r"^(python3?|pip|git|npm|node|cargo|go|make|gcc|g\+\+|sh|bash)\s+.*",
-            r"^(ls|cat|mkdir|cp|mv|rm|find|grep|chmod|chown)\s+.*",
+            r"(python3?|pip|git|npm|node|cargo|go|make|gcc|g\+\+|sh|bash)\s",
+            r"(ls|cat|mkdir|cp|mv|rm|find|grep|chmod|chown)\s",
         ],
         "intent": "shell",
     },
 ]
 
+for _entry in INTENT_PATTERNS:
+    _entry["compiled"] = [re.compile(p, re.IGNORECASE) for p in _entry["patterns"]]
+del _entry
+
+# Keyword prefilter: most patterns can only match if the input starts with
+# one of the literals in their leading group. Those literals go into a trie
+# so one walk over the first few characters of the input selects the
+# candidate patterns; the rest are skipped without running the regex.
+# Folding treats I/ı/İ alike, matching re.IGNORECASE.
+_FOLD = str.maketrans({"ı": "i", "\u0307": None})
+_LITERAL_HEAD = re.compile(r"[^\\?*+.()\[\]{}|^$]*")
+
+
+def _fold(text):
+    return text.casefold().translate(_FOLD)
+
+
+def _literal_head(pattern):
+    head = _LITERAL_HEAD.match(pattern).group()
+    if pattern[len(head):len(head) + 1] in ("?", "*", "{"):
+        head = head[:-1]  # last literal is optional
+    return head
+
+
+def _leading_literals(pattern):
+    """Literal prefixes one of which every match must start with, or None."""
+    pattern = pattern.lstrip("^")
+    if not pattern.startswith("("):
+        head = _literal_head(pattern)
+        return [head] if head else None
+    end = pattern.find(")")
+    group = pattern[1:end]
+    if end < 0 or "(" in group or pattern[end + 1:end + 2] in ("?", "*", "{"):
+        return None
+    heads = [_literal_head(alt) for alt in group.split("|")]
+    return heads if all(heads) else None
+
+
+_PATTERN_TABLE = []  # (intent, compiled) in priority order
+_UNFILTERED = []     # indexes into _PATTERN_TABLE that are always tried
+_PREFIX_TRIE = {}    # char -> child node; "" holds indexes ending at that node
+_PREFIX_SCAN = 0     # longest literal; folding never shortens text
+for _entry in INTENT_PATTERNS:
+    for _source, _compiled in zip(_entry["patterns"], _entry["compiled"]):
+        _index = len(_PATTERN_TABLE)
+        _PATTERN_TABLE.append((_entry["intent"], _compiled))
+        _heads = _leading_literals(_source)
+        if _heads is None:
+            _UNFILTERED.append(_index)
+            continue
+        for _head in _heads:
+            _PREFIX_SCAN = max(_PREFIX_SCAN, len(_head))
+            _node = _PREFIX_TRIE
+            for _ch in _fold(_head):
+                _node = _node.setdefault(_ch, {})
+            _node.setdefault("", []).append(_index)
+del _entry, _source, _compiled, _index, _heads, _head, _node, _ch
+
+
+def _candidate_patterns(text):
+    """(intent, compiled) pairs that may match text, in priority order."""
+    hits = set(_UNFILTERED)
+    node = _PREFIX_TRIE
+    for ch in _fold(text[:_PREFIX_SCAN]):
+        node = node.get(ch)
+        if node is None:
+            break
+        hits.update(node.get("", ()))
+    return [_PATTERN_TABLE[i] for i in sorted(hits)]
+
+
+# Captured words that are part of the command, not a project name
+_PROJECT_STOPWORDS = frozenset({'yeni', 'new', 'proje', 'project', 'oluştur', 'create', 'init', 'yarat', 'aç'})
+
+_NAME_DISALLOWED = re.compile(r'[^\w\s-]+')
+
+_GIT_OP_RE = re.compile(r'(?P<commit>commit|kaydet)|(?P<status>status)|(?P<log>log)', re.IGNORECASE)
+
+TOOL_PROTOCOL_PATTERN = re.compile(r'TOOL:\s*(\w+)\s*ARGS:\s*(.*)', re.DOTALL)
+
+
+# Static file contents written by the create-api and dockerize plans
+_API_SERVER_CODE = '''#!/usr/bin/env python3
+"""Minimal HTTP API Server."""
+import json
+import http.server
+import socketserver
+
+PORT = 8080
+DATA = {}
+
+class APIHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/health':
+            self._respond(200, {"status": "ok"})
+        elif self.path == '/data':
+            self._respond(200, {"data": DATA})
+        elif self.path.startswith('/data/'):
+            key = self.path.split('/')[-1]
+            if key in DATA:
+                self._respond(200, {key: DATA[key]})
+            else:
+                self._respond(404, {"error": "not found"})
+        else:
+            self._respond(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode()
+        try:
+            payload = json.loads(body)
+            for k, v in payload.items():
+                DATA[k] = v
+            self._respond(201, {"stored": payload})
+        except json.JSONDecodeError:
+            self._respond(400, {"error": "invalid json"})
+
+    def do_DELETE(self):
+        if self.path.startswith('/data/'):
+            key = self.path.split('/')[-1]
+            if key in DATA:
+                del DATA[key]
+                self._respond(200, {"deleted": key})
+            else:
+                self._respond(404, {"error": "not found"})
+        else:
+            self._respond(400, {"error": "specify key"})
+
+    def _respond(self, code, body):
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode())
+
+    def log_message(self, format, *args):
+        pass  # Suppress default logging
+
+if __name__ == '__main__':
+    with socketserver.TCPServer(("", PORT), APIHandler) as httpd:
+        print(f"API listening on :{PORT}")
+        httpd.serve_forever()
+'''
+
+_API_TEST_CODE = '''#!/usr/bin/env python3
+"""API Server Tests."""
+import unittest
+import json
+import threading
+import http.client
+import time
+import sys
+
+sys.path.insert(0, '.')
+
+class TestAPI(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        from server import APIHandler
+        import socketserver
+        cls.port = 9999
+        cls.server = socketserver.TCPServer(("", cls.port), APIHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.daemon = True
+        cls.thread.start()
+        time.sleep(0.5)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def _request(self, method, path, body=None):
+        conn = http.client.HTTPConnection("localhost", self.port)
+        headers = {'Content-Type': 'application/json'} if body else {}
+        conn.request(method, path, body=json.dumps(body) if body else None, headers=headers)
+        resp = conn.getresponse()
+        data = json.loads(resp.read().decode())
+        conn.close()
+        return resp.status, data
+
+    def test_health(self):
+        status, data = self._request("GET", "/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(data["status"], "ok")
+
+    def test_post_and_get(self):
+        status, data = self._request("POST", "/data", {"key1": "value1"})
+        self.assertEqual(status, 201)
+        status, data = self._request("GET", "/data/key1")
+        self.assertEqual(status, 200)
+        self.assertEqual(data["key1"], "value1")
+
+    def test_delete(self):
+        self._request("POST", "/data", {"delme": "val"})
+        status, data = self._request("DELETE", "/data/delme")
+        self.assertEqual(status, 200)
+        status, data = self._request("GET", "/data/delme")
+        self.assertEqual(status, 404)
+
+    def test_not_found(self):
+        status, data = self._request("GET", "/nonexistent")
+        self.assertEqual(status, 404)
+
+if __name__ == '__main__':
+    unittest.main()
+'''
+
+_DEFAULT_DOCKERFILE = """FROM python:3.12-alpine
+WORKDIR /app
+COPY . .
+RUN pip install --no-cache-dir -r requirements.txt 2>/dev/null || true
+EXPOSE 8080
+CMD ["python3", "main.py"]
+"""
+
+_DEFAULT_COMPOSE_TEMPLATE = """version: '3.8'
+services:
+  {name}:
+    build: .
+    ports:
+      - "8080:8080"
+    restart: unless-stopped
+"""
+
 
 class CommandParser:
     """Parses operator input into executable action plans."""
 
     def __init__(self, project_root="/projects"):
         self.project_root = project_root
+        self._latest_cache = (None, 0.0, None)  # (root mtime_ns, expires, path)
+        self._match_cache = OrderedDict()  # text -> (intent, match), LRU order
 
     def parse(self, input_text):
         """
@@ -132,11 +372,9 @@ class CommandParser:
             return self._parse_tool_protocol(text)
 
         # Try intent matching
-        for entry in INTENT_PATTERNS:
-            for pattern in entry["patterns"]:
-                match = re.match(pattern, text, re.IGNORECASE)
-                if match:
-                    return self._build_plan(entry["intent"], match, text)
+        intent, match = self._match_intent(text)
+        if match:
+            return self._build_plan(intent, match, text)
 
         # Fallback: treat as shell command
         return {
@@ -145,14 +383,36 @@ class CommandParser:
             "actions": [{"tool": "run", "args": {"command": text}}]
         }
 
+    def _match_intent(self, text):
+        """
+        Return (intent, match) for the first matching pattern, or (None, None).
+        Only the match is cached: plans are rebuilt on every call, so ones
+        that depend on the latest project or the clock stay fresh.
+        """
+        cache = self._match_cache
+        hit = cache.get(text)
+        if hit is not None:
+            cache.move_to_end(text)
+            return hit
+        hit = (None, None)
+        for intent, pattern in _candidate_patterns(text):
+            match = pattern.match(text)
+            if match:
+                hit = (intent, match)
+                break
+        cache[text] = hit
+        if len(cache) > PARSE_CACHE_SIZE:
+            cache.popitem(last=False)
+        return hit
+
     def _parse_tool_protocol(self, text):
         """Parse TOOL: name ARGS: json format."""
         try:
-            match = re.match(r'TOOL:\s*(\w+)\s*ARGS:\s*(.*)', text, re.DOTALL)
+            match = TOOL_PROTOCOL_PATTERN.match(text)
             if match:
                 tool_name = match.group(1)
                 args_str = match.group(2).strip()
-                args = json.loads(args_str) if args_str else {}
+                args = _json_loads(args_str) if args_str else {}
                 return {
                     "intent": "tool_call",
                     "actions": [{"tool": tool_name, "args": args}]
@@ -223,19 +483,17 @@ class CommandParser:
         """Extract project/tool name from match groups."""
         for i in range(match.lastindex or 0, 0, -1):
             g = match.group(i)
-            if g and len(g) > 1 and not g.lower() in ['yeni', 'new', 'proje', 'project', 'oluştur', 'create', 'init', 'yarat', 'aç']:
+            if g and len(g) > 1 and g.lower() not in _PROJECT_STOPWORDS:
                 return g.strip()
         return None
 
     def _sanitize_name(self, name):
         """Sanitize a string into a valid directory/project name."""
-        name = re.sub(r'[^\w\s-]', '', name.lower())
-        name = re.sub(r'[\s]+', '_', name.strip())
-        return name or "project"
+        return "_".join(_NAME_DISALLOWED.sub('', name.lower()).split()) or "project"
 
     def _plan_create_project(self, name):
         """Plan: create a new project directory with git."""
-        path = f"{self.project_root}/{name}"
+        path = os.path.join(self.project_root, name)
         return {
             "intent": "create_project",
             "name": name,
@@ -244,7 +502,7 @@ class CommandParser:
                 {"tool": "mkdir", "args": {"path": path}},
                 {"tool": "git_init", "args": {"path": path}},
                 {"tool": "write", "args": {
-                    "path": f"{path}/README.md",
+                    "path": os.path.join(path, "README.md"),
                     "content": f"# {name}\n\nAuto-generated project.\n"
                 }},
                 {"tool": "git_commit", "args": {"path": path, "message": f"init: {name}"}},
@@ -254,129 +512,7 @@ class CommandParser:
     def _plan_create_api(self):
         """Plan: create a simple REST API project."""
         name = "api_server"
-        path = f"{self.project_root}/{name}"
-        server_code = '''#!/usr/bin/env python3
-"""Minimal HTTP API Server."""
-import json
-import http.server
-import socketserver
-
-PORT = 8080
-DATA = {}
-
-class APIHandler(http.server.BaseHTTPRequestHandler):
-    def do_GET(self):
-        if self.path == '/health':
-            self._respond(200, {"status": "ok"})
-        elif self.path == '/data':
-            self._respond(200, {"data": DATA})
-        elif self.path.startswith('/data/'):
-            key = self.path.split('/')[-1]
-            if key in DATA:
-                self._respond(200, {key: DATA[key]})
-            else:
-                self._respond(404, {"error": "not found"})
-        else:
-            self._respond(404, {"error": "not found"})
-
-    def do_POST(self):
-        length = int(self.headers.get('Content-Length', 0))
-        body = self.rfile.read(length).decode()
-        try:
-            payload = json.loads(body)
-            for k, v in payload.items():
-                DATA[k] = v
-            self._respond(201, {"stored": payload})
-        except json.JSONDecodeError:
-            self._respond(400, {"error": "invalid json"})
-
-    def do_DELETE(self):
-        if self.path.startswith('/data/'):
-            key = self.path.split('/')[-1]
-            if key in DATA:
-                del DATA[key]
-                self._respond(200, {"deleted": key})
-            else:
-                self._respond(404, {"error": "not found"})
-        else:
-            self._respond(400, {"error": "specify key"})
-
-    def _respond(self, code, body):
-        self.send_response(code)
-        self.send_header('Content-Type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps(body).encode())
-
-    def log_message(self, format, *args):
-        pass  # Suppress default logging
-
-if __name__ == '__main__':
-    with socketserver.TCPServer(("", PORT), APIHandler) as httpd:
-        print(f"API listening on :{PORT}")
-        httpd.serve_forever()
-'''
-        test_code = '''#!/usr/bin/env python3
-"""API Server Tests."""
-import unittest
-import json
-import threading
-import http.client
-import time
-import sys
-
-sys.path.insert(0, '.')
-
-class TestAPI(unittest.TestCase):
-    @classmethod
-    def setUpClass(cls):
-        from server import APIHandler
-        import socketserver
-        cls.port = 9999
-        cls.server = socketserver.TCPServer(("", cls.port), APIHandler)
-        cls.thread = threading.Thread(target=cls.server.serve_forever)
-        cls.thread.daemon = True
-        cls.thread.start()
-        time.sleep(0.5)
-
-    @classmethod
-    def tearDownClass(cls):
-        cls.server.shutdown()
-
-    def _request(self, method, path, body=None):
-        conn = http.client.HTTPConnection("localhost", self.port)
-        headers = {'Content-Type': 'application/json'} if body else {}
-        conn.request(method, path, body=json.dumps(body) if body else None, headers=headers)
-        resp = conn.getresponse()
-        data = json.loads(resp.read().decode())
-        conn.close()
-        return resp.status, data
-
-    def test_health(self):
-        status, data = self._request("GET", "/health")
-        self.assertEqual(status, 200)
-        self.assertEqual(data["status"], "ok")
-
-    def test_post_and_get(self):
-        status, data = self._request("POST", "/data", {"key1": "value1"})
-        self.assertEqual(status, 201)
-        status, data = self._request("GET", "/data/key1")
-        self.assertEqual(status, 200)
-        self.assertEqual(data["key1"], "value1")
-
-    def test_delete(self):
-        self._request("POST", "/data", {"delme": "val"})
-        status, data = self._request("DELETE", "/data/delme")
-        self.assertEqual(status, 200)
-        status, data = self._request("GET", "/data/delme")
-        self.assertEqual(status, 404)
-
-    def test_not_found(self):
-        status, data = self._request("GET", "/nonexistent")
-        self.assertEqual(status, 404)
-
-if __name__ == '__main__':
-    unittest.main()
-'''
+        path = os.path.join(self.project_root, name)
         return {
             "intent": "create_api",
             "name": name,
@@ -384,8 +520,8 @@ if __name__ == '__main__':
             "actions": [
                 {"tool": "mkdir", "args": {"path": path}},
                 {"tool": "git_init", "args": {"path": path}},
-                {"tool": "write", "args": {"path": f"{path}/server.py", "content": server_code}},
-                {"tool": "write", "args": {"path": f"{path}/test_server.py", "content": test_code}},
+                {"tool": "write", "args": {"path": os.path.join(path, "server.py"), "content": _API_SERVER_CODE}},
+                {"tool": "write", "args": {"path": os.path.join(path, "test_server.py"), "content": _API_TEST_CODE}},
                 {"tool": "test", "args": {"path": path}},
                 {"tool": "git_commit", "args": {"path": path, "message": "feat: REST API server with CRUD and tests"}},
             ]
@@ -394,7 +530,7 @@ if __name__ == '__main__':
     def _plan_create_tool(self, description):
         """Plan: create a CLI tool based on description."""
         name = self._sanitize_name(description) or "cli_tool"
-        path = f"{self.project_root}/{name}"
+        path = os.path.join(self.project_root, name)
         return {
             "intent": "create_tool",
             "name": name,
@@ -451,27 +587,12 @@ if __name__ == '__main__':
             return {"intent": "dockerize", "actions": [], "error": "No project found"}
 
         name = os.path.basename(latest)
-        dockerfile = f"""FROM python:3.12-alpine
-WORKDIR /app
-COPY . .
-RUN pip install --no-cache-dir -r requirements.txt 2>/dev/null || true
-EXPOSE 8080
-CMD ["python3", "main.py"]
-"""
-        compose = f"""version: '3.8'
-services:
-  {name}:
-    build: .
-    ports:
-      - "8080:8080"
-    restart: unless-stopped
-"""
         return {
             "intent": "dockerize",
             "path": latest,
             "actions": [
-                {"tool": "write", "args": {"path": f"{latest}/Dockerfile", "content": dockerfile}},
-                {"tool": "write", "args": {"path": f"{latest}/docker-compose.yml", "content": compose}},
+                {"tool": "write", "args": {"path": os.path.join(latest, "Dockerfile"), "content": _DEFAULT_DOCKERFILE}},
+                {"tool": "write", "args": {"path": os.path.join(latest, "docker-compose.yml"), "content": _DEFAULT_COMPOSE_TEMPLATE.format(name=name)}},
                 {"tool": "git_commit", "args": {"path": latest, "message": "feat: add Docker support"}},
             ]
         }
@@ -481,17 +602,19 @@ services:
         latest = self._get_latest_project()
         path = latest or self.project_root
 
-        if "commit" in raw.lower() or "kaydet" in raw.lower():
+        # One pass collects every subcommand keyword; commit wins over status over log
+        found = {m.lastgroup for m in _GIT_OP_RE.finditer(raw)}
+        if "commit" in found:
             return {
                 "intent": "git_commit",
                 "actions": [{"tool": "git_commit", "args": {"path": path, "message": "auto: checkpoint commit"}}]
             }
-        elif "status" in raw.lower():
+        elif "status" in found:
             return {
                 "intent": "git_status",
                 "actions": [{"tool": "git_status", "args": {"path": path}}]
             }
-        elif "log" in raw.lower():
+        elif "log" in found:
             return {
                 "intent": "git_log",
                 "actions": [{"tool": "git_log", "args": {"path": path}}]
@@ -515,14 +638,28 @@ services:
     def _get_latest_project(self):
         """Get the most recently modified project directory."""
         try:
-            entries = os.listdir(self.project_root)
-            dirs = [
-                os.path.join(self.project_root, d)
-                for d in entries
-                if os.path.isdir(os.path.join(self.project_root, d))
-            ]
-            if dirs:
-                return max(dirs, key=os.path.getmtime)
+            root_mtime = os.stat(self.project_root).st_mtime_ns
+        except OSError:
+            return None
+        cached_mtime, expires, cached_path = self._latest_cache
+        now = time.monotonic()
+        if root_mtime == cached_mtime and now < expires:
+            return cached_path
+        latest = self._scan_latest_project()
+        self._latest_cache = (root_mtime, now + LATEST_PROJECT_TTL, latest)
+        return latest
+
+    def _scan_latest_project(self):
+        latest, latest_mtime = None, -1
+        try:
+            with os.scandir(self.project_root) as it:
+                for entry in it:
+                    # Hidden dirs (e.g. the agent's .staging area) are not projects
+                    if not entry.is_dir() or entry.name.startswith('.'):
+                        continue
+                    mtime = entry.stat().st_mtime_ns
+                    if mtime > latest_mtime:
+                        latest, latest_mtime = entry.path, mtime
         except Exception:
-            pass
-        return None
+            return None
+        return latest
@@ -1,5 +1,6 @@
 
 import re
+import json
 import logging
 
 class OutputEnforcer:
@@ -50,12 +51,22 @@ class OutputEnforcer:
         "LOG:",
         "ACTION:",
     ]
+    _VALID_PREFIX_TUPLE = tuple(VALID_PREFIXES)
 
     def __init__(self):
-        self._compiled = [
-            re.compile(p, re.IGNORECASE | re.MULTILINE)
-            for p in self.CONVERSATIONAL_PATTERNS
-        ]
+        # All patterns in one regex, applied with .match() per line: the
+        # "^..." ones become a leading alternation and the ".*X.*" ones a
+        # single ".*?(?:X|Y)" scan.
+        leading, anywhere = [], []
+        for p in self.CONVERSATIONAL_PATTERNS:
+            if p.startswith(".*") and p.endswith(".*"):
+                anywhere.append(f"(?:{p[2:-2]})")
+            else:
+                leading.append(f"(?:{p.lstrip('^')})")
+        self._chat_re = re.compile(
+            f"(?:{'|'.join(leading)})|.*?(?:{'|'.join(anywhere)})",
+            re.IGNORECASE
+        )
 
     def enforce(self, text):
         """
@@ -74,31 +85,23 @@ class OutputEnforcer:
         # Pass through structured JSON
         if text.startswith("{") or text.startswith("["):
             try:
-                import json
                 json.loads(text)
                 return text
             except (json.JSONDecodeError, ValueError):
                 pass
 
-        # Pass through valid prefixed output
-        for prefix in self.VALID_PREFIXES:
-            if text.startswith(prefix):
-                return text
+        # Pass through valid prefixed output (checked before any line split)
+        if text.startswith(self._VALID_PREFIX_TUPLE):
+            return text
 
         # Filter conversational text line by line
-        lines = text.split('\n')
         clean_lines = []
-        for line in lines:
+        is_chat = self._chat_re.match
+        keep = clean_lines.append
+        for line in text.split('\n'):
             stripped = line.strip()
-            if not stripped:
-                continue
-            is_chat = False
-            for pattern in self._compiled:
-                if pattern.match(stripped):
-                    is_chat = True
-                    break
-            if not is_chat:
-                clean_lines.append(line)
+            if stripped and not is_chat(stripped):
+                keep(line)
 
         if not clean_lines:
             return None
@@ -118,9 +121,8 @@ class OutputEnforcer:
             return text
         if text.startswith("{") or text.startswith("["):
             return text
-        for prefix in self.VALID_PREFIXES:
-            if text.startswith(prefix):
-                return text
+        if text.startswith(self._VALID_PREFIX_TUPLE):
+            return text
         return None
 
 
@@ -162,19 +164,24 @@ class InputSanitizer:
         "/sys/",
         "/dev/",
     ]
+    _PROTECTED_PATH_TUPLE = tuple(PROTECTED_PATHS)
 
     def __init__(self):
-        self._forbidden = [
-            re.compile(p, re.IGNORECASE)
-            for p in self.FORBIDDEN_PATTERNS
-        ]
+        # One alternation so a command is scanned once, not once per pattern
+        self._forbidden = re.compile(
+            "|".join(f"(?:{p})" for p in self.FORBIDDEN_PATTERNS),
+            re.IGNORECASE
+        )
+        # Control characters except \t, \n and \r, deleted via str.translate
+        control = [*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), 0x7f]
+        self._control_table = dict.fromkeys(control)
+        self._control_bytes = bytes(control)
 
     def is_safe_command(self, command):
         """Check if a shell command is safe to execute."""
-        for pattern in self._forbidden:
-            if pattern.search(command):
-                logging.warning(f"SECURITY: Blocked forbidden command: {command[:100]}")
-                return False
+        if self._forbidden.search(command):
+            logging.warning(f"SECURITY: Blocked forbidden command: {command[:100]}")
+            return False
         return True
 
     def is_safe_path(self, path, operation="read"):
@@ -183,20 +190,23 @@ class InputSanitizer:
             return True  # Reading is always allowed
 
         # Writing/deleting protected paths is forbidden
-        for protected in self.PROTECTED_PATHS:
-            if path.startswith(protected):
-                logging.warning(f"SECURITY: Blocked {operation} on protected path: {path}")
-                return False
+        if path.startswith(self._PROTECTED_PATH_TUPLE):
+            logging.warning(f"SECURITY: Blocked {operation} on protected path: {path}")
+            return False
         return True
 
     def sanitize_input(self, text):
         """
         Basic input sanitization.
         Removes control characters, limits length.
+        Raw bytes (e.g. from a socket) are cleaned as bytes, without decoding.
         """
         if not text:
-            return ""
+            return b"" if isinstance(text, (bytes, bytearray)) else ""
+        # Limit length first so oversized input is never scanned in full
+        if len(text) > 4096:
+            text = text[:4096]
         # Remove control characters except newline
-        clean = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', text)
-        # Limit length
-        return clean[:4096]
+        if isinstance(text, (bytes, bytearray)):
+            return bytes(text).translate(None, self._control_bytes)
+        return text.translate(self._control_table)
@@ -3,9 +3,33 @@ import os
 import logging
 import json
 import re
+import hashlib
+import tempfile
+import threading
 
 MODELS_DIR = "/ai/models"
 SYSTEM_PROMPT_PATH = "/ai/core/system_prompt.txt"
+CACHE_DIR = "/ai/cache/llm"
+# Only near-deterministic calls are cached; sampling above this can differ run to run
+CACHE_MAX_TEMPERATURE = 0.3
+# RAM budget for saved llama.cpp KV states (prompt prefix reuse)
+PROMPT_CACHE_BYTES = 512 << 20
+# Built once and shared by every call (llama-cpp matches stop strings on decoded text)
+DEFAULT_STOP = ["\n\n\n", "USER:", "HUMAN:"]
+# Filename quantization tags, most preferred first: fewer bytes per weight
+# means less memory traffic per token on CPU inference
+QUANT_PREFERENCE = ["q4_k_m", "q4_k_s", "q4_0", "q5_k_m", "q5_k_s", "q8_0", "f16", "f32"]
+
+_TOOL_RE = re.compile(r'TOOL:\s*(\w+)\s*ARGS:\s*(.*)')
+_JSON_RE = re.compile(r'\{.*\}', re.DOTALL)
+_CODE_BLOCK_RE = re.compile(r'```(?:python|py)?\s*\n(.*?)```', re.DOTALL)
+
+
+def _available_cpus():
+    """CPUs this process may run on (affinity-aware where supported)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 4
 
 
 class LLMEngine:
@@ -17,13 +41,20 @@ class LLMEngine:
     No cloud. No API calls. Fully offline.
     """
 
-    def __init__(self, model_path=None, n_ctx=2048, n_threads=4):
+    def __init__(self, model_path=None, n_ctx=2048, n_threads=None):
         self.model = None
         self.model_path = model_path
         self.n_ctx = n_ctx
-        self.n_threads = n_threads
+        self.n_threads = n_threads or _available_cpus()
         self.system_prompt = self._load_system_prompt()
+        # Static head of every prompt. Kept byte-identical across calls so
+        # llama.cpp can reuse the evaluated KV state for this prefix.
+        self.prompt_prefix = f"{self.system_prompt}\n\nTASK: "
         self.available = False
+        self.cache_dir = CACHE_DIR
+        self.stats = {"hits": 0, "misses": 0}
+        # A Llama context is not re-entrant; calls from worker threads queue here
+        self._lock = threading.Lock()
 
         if model_path:
             self._load_model(model_path)
@@ -73,37 +104,59 @@ Rules:
                 gguf_files.append(os.path.join(MODELS_DIR, f))
 
         if gguf_files:
-            # Pick the first (or largest) model
-            gguf_files.sort(key=lambda p: os.path.getsize(p), reverse=True)
+            # Prefer the most compact quantization; among equals, the largest model
+            gguf_files.sort(key=lambda p: (self._quant_rank(p), -os.path.getsize(p)))
             self._load_model(gguf_files[0])
         else:
             logging.info("LLM: No GGUF models found. Running in template mode.")
 
+    @staticmethod
+    def _quant_rank(path):
+        """Position of the file's quantization tag in QUANT_PREFERENCE (unknown last)."""
+        name = os.path.basename(path).lower()
+        for rank, tag in enumerate(QUANT_PREFERENCE):
+            if tag in name:
+                return rank
+        return len(QUANT_PREFERENCE)
+
     def _load_model(self, path):
         """Load a GGUF model using llama-cpp-python."""
         if not os.path.exists(path):
-            logging.error(f"LLM: Model file not found: {path}")
+            logging.error("LLM: Model file not found: %s", path)
             return
 
         try:
             from llama_cpp import Llama
-            logging.info(f"LLM: Loading model: {os.path.basename(path)}")
-            logging.info(f"LLM: Context: {self.n_ctx}, Threads: {self.n_threads}")
+            logging.info("LLM: Loading model: %s", os.path.basename(path))
+            logging.info("LLM: Context: %d, Threads: %d", self.n_ctx, self.n_threads)
 
             self.model = Llama(
                 model_path=path,
                 n_ctx=self.n_ctx,
                 n_threads=self.n_threads,
+                n_threads_batch=self.n_threads,  # prompt prefill is matmul-bound and scales with cores
                 n_gpu_layers=0,  # CPU only for now
                 verbose=False,
             )
+            self._enable_prompt_cache()
             self.model_path = path
             self.available = True
-            logging.info(f"LLM: Model loaded successfully.")
+            logging.info("LLM: Model loaded successfully.")
         except ImportError:
             logging.warning("LLM: llama-cpp-python not installed. Template mode only.")
         except Exception as e:
-            logging.error(f"LLM: Failed to load model: {e}")
+            logging.error("LLM: Failed to load model: %s", e)
+
+    def _enable_prompt_cache(self):
+        """
+        Keep evaluated KV states between calls so a new prompt that shares
+        the system-prompt prefix only needs prefill for the differing tail.
+        """
+        try:
+            from llama_cpp import LlamaCache
+            self.model.set_cache(LlamaCache(capacity_bytes=PROMPT_CACHE_BYTES))
+        except (ImportError, AttributeError) as e:
+            logging.info("LLM: Prompt cache unavailable: %s", e)
 
     def generate(self, prompt, max_tokens=1024, temperature=0.2, stop=None):
         """
@@ -113,44 +166,129 @@ Rules:
         if not self.available or not self.model:
             return None
 
-        stop = stop or ["\n\n\n", "USER:", "HUMAN:"]
+        stop = stop or DEFAULT_STOP
+
+        cache_key = None
+        if temperature <= CACHE_MAX_TEMPERATURE:
+            cache_key = self._cache_key(prompt, max_tokens, temperature, stop)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                self.stats["hits"] += 1
+                logging.info("LLM: Cache hit (%d chars)", len(cached))
+                return cached
+            self.stats["misses"] += 1
 
         try:
-            full_prompt = f"{self.system_prompt}\n\nTASK: {prompt}\n\nOUTPUT:\n"
-
-            result = self.model(
-                full_prompt,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                stop=stop,
-                echo=False,
-            )
+            full_prompt = f"{self.prompt_prefix}{prompt}\n\nOUTPUT:\n"
+
+            with self._lock:
+                result = self.model(
+                    full_prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stop=stop,
+                    echo=False,
+                )
 
             text = result['choices'][0]['text'].strip()
-            logging.info(f"LLM: Generated {len(text)} chars")
+            logging.info("LLM: Generated %d chars", len(text))
+            if cache_key and text:
+                self._cache_put(cache_key, text)
             return text
 
         except Exception as e:
-            logging.error(f"LLM: Generation failed: {e}")
+            logging.error("LLM: Generation failed: %s", e)
+            return None
+
+    def _cache_key(self, prompt, max_tokens, temperature, stop):
+        """Hash of everything that determines the completion."""
+        blob = json.dumps({
+            "sys": self.system_prompt, "p": prompt, "mt": max_tokens,
+            "t": temperature, "s": stop, "m": self.model_path,
+        }, sort_keys=True)
+        return hashlib.sha256(blob.encode()).hexdigest()
+
+    def _cache_get(self, key):
+        try:
+            with open(os.path.join(self.cache_dir, key + ".txt")) as f:
+                return f.read()
+        except OSError:
             return None
 
-    def generate_tool_calls(self, task_description):
+    def _cache_put(self, key, text):
+        """Write a cache entry atomically (tmp file + rename)."""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+                f.write(text)
+            os.replace(f.name, os.path.join(self.cache_dir, key + ".txt"))
+        except OSError as e:
+            logging.warning("LLM: Cache write failed: %s", e)
+
+    def generate_tool_calls(self, task_description, max_calls=None):
         """
         Generate a list of tool calls for a given task.
         Returns list of dicts: [{"tool": str, "args": dict}, ...]
+
+        Tokens are streamed and parsed line by line; once max_calls
+        calls are parsed, generation is stopped instead of run to the end.
         """
-        raw = self.generate(task_description)
-        if not raw:
+        if not self.available or not self.model:
             return []
 
-        return self.parse_tool_calls(raw)
+        max_tokens, temperature = 1024, 0.2
+        stop = DEFAULT_STOP
+        cache_key = self._cache_key(task_description, max_tokens, temperature, stop)
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return self.parse_tool_calls(cached)[:max_calls]
+        self.stats["misses"] += 1
+
+        calls = []
+        parts = []
+        buf = ""
+        stream = None
+        with self._lock:
+            try:
+                stream = self.model(
+                    f"{self.prompt_prefix}{task_description}\n\nOUTPUT:\n",
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    stop=stop,
+                    echo=False,
+                    stream=True,
+                )
+                for chunk in stream:
+                    piece = chunk['choices'][0]['text']
+                    parts.append(piece)
+                    buf += piece
+                    if '\n' not in piece:
+                        continue
+                    lines, _, buf = buf.rpartition('\n')
+                    calls.extend(self.parse_tool_calls(lines))
+                    if max_calls is not None and len(calls) >= max_calls:
+                        logging.info("LLM: Stopped after %d tool calls", len(calls))
+                        return calls[:max_calls]
+                calls.extend(self.parse_tool_calls(buf))
+                text = "".join(parts).strip()
+                if text:
+                    self._cache_put(cache_key, text)
+            except Exception as e:
+                logging.error("LLM: Generation failed: %s", e)
+            finally:
+                # Closing the generator ends llama.cpp decoding early
+                if stream is not None and hasattr(stream, "close"):
+                    stream.close()
+        return calls[:max_calls]
 
     def generate_code(self, description, language="python", filename="main.py"):
         """
         Generate code for a specific task.
         Returns the code as a string.
         """
-        prompt = f"Write {language} code for: {description}\nFilename: {filename}\nOutput ONLY the code, no explanations."
+        # Fixed instructions first, task-specific text last (shared prompt prefix)
+        prompt = f"Output ONLY the code, no explanations.\nWrite {language} code for: {description}\nFilename: {filename}"
 
         raw = self.generate(prompt, max_tokens=2048, temperature=0.3)
         if not raw:
@@ -165,9 +303,9 @@ Rules:
         Generate a project plan: list of files and their purposes.
         Returns dict: {"files": {"filename": "description"}, "test_cmd": "..."}
         """
-        prompt = f"""Plan a project: {description}
-Output JSON only:
-{{"files": {{"filename.py": "description"}}, "test_cmd": "command to run tests"}}"""
+        prompt = f"""Output JSON only:
+{{"files": {{"filename.py": "description"}}, "test_cmd": "command to run tests"}}
+Plan a project: {description}"""
 
         raw = self.generate(prompt, max_tokens=512, temperature=0.2)
         if not raw:
@@ -175,7 +313,7 @@ Output JSON only:
 
         try:
             # Try to extract JSON
-            json_match = re.search(r'\{.*\}', raw, re.DOTALL)
+            json_match = _JSON_RE.search(raw)
             if json_match:
                 return json.loads(json_match.group())
         except json.JSONDecodeError:
@@ -183,20 +321,27 @@ Output JSON only:
 
         return None
 
-    def generate_fix(self, code, error_message, filename="main.py"):
+    def generate_fix(self, code, error_message, filename="main.py", first_line=None):
         """
         Given code and an error, generate a fix.
         Returns fixed code string.
+
+        With first_line set, `code` is an excerpt of the file starting at that
+        line; it is sent whole and the fix covers just those lines.
         """
-        prompt = f"""Fix this {filename}:
+        if first_line is None:
+            header, context = f"Fix this {filename}:", code[:2000]
+        else:
+            last_line = first_line + len(code.splitlines()) - 1
+            header, context = f"Fix lines {first_line}-{last_line} of {filename}:", code
+        prompt = f"""Output ONLY the fixed code, nothing else.
+{header}
 ```
-{code[:2000]}
+{context}
 ```
 
 Error:
-{error_message[:500]}
-
-Output ONLY the fixed code, nothing else."""
+{error_message[:500]}"""
 
         raw = self.generate(prompt, max_tokens=2048, temperature=0.1)
         if not raw:
@@ -212,7 +357,7 @@ Output ONLY the fixed code, nothing else."""
             line = line.strip()
             if not line:
                 continue
-            match = re.match(r'TOOL:\s*(\w+)\s*ARGS:\s*(.*)', line)
+            match = _TOOL_RE.match(line)
             if match:
                 tool_name = match.group(1)
                 args_str = match.group(2).strip()
@@ -220,16 +365,18 @@ Output ONLY the fixed code, nothing else."""
                     args = json.loads(args_str) if args_str else {}
                     calls.append({"tool": tool_name, "args": args})
                 except json.JSONDecodeError:
-                    logging.warning(f"LLM: Invalid args JSON: {args_str[:100]}")
+                    logging.warning("LLM: Invalid args JSON: %.100s", args_str)
         return calls
 
     @staticmethod
     def _extract_code(text):
         """Extract code from markdown code blocks or return raw text."""
-        # Try ```python ... ``` or ``` ... ```
-        match = re.search(r'```(?:python|py)?\s*\n(.*?)```', text, re.DOTALL)
-        if match:
-            return match.group(1).strip()
+        # Plain substring scan first; the regex only runs when a fence exists
+        if '```' in text:
+            # Try ```python ... ``` or ``` ... ```
+            match = _CODE_BLOCK_RE.search(text)
+            if match:
+                return match.group(1).strip()
         # If no code block, return the raw text (might be just code)
         return text.strip()
 
@@ -244,4 +391,5 @@ Output ONLY the fixed code, nothing else."""
             "model": os.path.basename(self.model_path) if self.model_path else None,
             "n_ctx": self.n_ctx,
             "n_threads": self.n_threads,
+            "cache": dict(self.stats),
         }
@@ -3,7 +3,11 @@ print("DEVOS KERNEL LOADING...", flush=True)
 
 import os
 import sys
+import atexit
 import logging
+import logging.handlers
+import queue
+import random
 import traceback
 import time
 
@@ -12,14 +16,17 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from autonomous import AutonomousAgent
 
+# Crash-recovery restart delay: doubles per consecutive failure, capped
+RESTART_BASE_DELAY = 5
+RESTART_MAX_DELAY = 60
+
 # Configure logging to stdout - execution logs only, no chat
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%H:%M:%S',
-    force=True
-)
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(logging.Formatter(
+    '%(asctime)s [%(levelname)s] %(message)s',
+    datefmt='%H:%M:%S'
+))
+log_handlers = [stream_handler]
 
 # Also log to file for persistence
 try:
@@ -29,10 +36,19 @@ try:
         '%(asctime)s [%(levelname)s] %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     ))
-    logging.getLogger().addHandler(file_handler)
+    log_handlers.append(file_handler)
 except Exception:
     pass  # File logging optional
 
+# Callers only enqueue records; a listener thread does the console/file writes
+log_queue = queue.SimpleQueue()
+queue_handler = logging.handlers.QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter('%(message)s'))  # final layout is applied by log_handlers
+logging.basicConfig(level=logging.INFO, handlers=[queue_handler], force=True)
+log_listener = logging.handlers.QueueListener(log_queue, *log_handlers)
+log_listener.start()
+atexit.register(log_listener.stop)
+
 
 def detect_mode():
     """
@@ -66,11 +82,11 @@ def main():
 
     # Detect mode
     mode = detect_mode()
-    logging.info(f"Mode: {mode}")
+    logging.info("Mode: %s", mode)
 
     # System checks
-    logging.info("Python: " + sys.version.split()[0])
-    logging.info("PID: " + str(os.getpid()))
+    logging.info("Python: %s", sys.version.split()[0])
+    logging.info("PID: %d", os.getpid())
 
     # Initialize agent
     agent = AutonomousAgent(mode=mode)
@@ -87,17 +103,24 @@ def main():
     print("--------------------------------------------------", flush=True)
 
     # Main loop with crash recovery
+    failures = 0
     while True:
+        started = time.monotonic()
         try:
             agent.start_loop()
         except KeyboardInterrupt:
             logging.info("Shutdown signal received.")
             break
-        except Exception as e:
-            logging.error(f"Critical failure: {e}")
-            traceback.print_exc()
-            logging.info("Restarting in 5 seconds...")
-            time.sleep(5)
+        except Exception:
+            logging.exception("Critical failure")
+            # A loop that ran longer than the max delay counts as recovered
+            if time.monotonic() - started > RESTART_MAX_DELAY:
+                failures = 0
+            delay = min(RESTART_MAX_DELAY, RESTART_BASE_DELAY * 2 ** failures)
+            delay = random.uniform(delay / 2, delay)  # jitter
+            failures += 1
+            logging.info("Restarting in %.1f seconds...", delay)
+            time.sleep(delay)
 
 
 if __name__ == "__main__":
@@ -1,20 +1,81 @@
 
 import os
+import atexit
+import re
 import json
+import gzip
+import hashlib
 import logging
+import math
+import shutil
+import threading
 import time
+from collections import Counter, deque
+
+# Encoders return bytes; deques (and other iterables) are written as lists
+try:
+    import orjson
+
+    def _dumps_pretty(obj):
+        return orjson.dumps(obj, default=list, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+    def _dumps_line(obj):
+        return orjson.dumps(obj, default=list, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+
+    _loads = orjson.loads  # raises a json.JSONDecodeError subclass
+except ImportError:
+    def _dumps_pretty(obj):
+        return json.dumps(obj, indent=2, default=list).encode()
+
+    def _dumps_line(obj):
+        return (json.dumps(obj, default=list) + '\n').encode()
+
+    _loads = json.loads
 
 MEMORY_DIR = "/ai/memory"
 STATE_FILE = os.path.join(MEMORY_DIR, "state.json")
 HISTORY_FILE = os.path.join(MEMORY_DIR, "history.jsonl")
 PROJECTS_FILE = os.path.join(MEMORY_DIR, "projects.json")
 PATTERNS_FILE = os.path.join(MEMORY_DIR, "patterns.json")
+PLANS_FILE = os.path.join(MEMORY_DIR, "plans.json")
+
+HISTORY_FLUSH_BATCH = 64       # pending entries that trigger an early flush
+HISTORY_FLUSH_INTERVAL = 0.5   # seconds between background flushes
+
+RECENT_HISTORY = 50  # latest history entries also kept in RAM for get_recent_history
+HISTORY_TAIL_CHUNK = 64 * 1024  # bytes read per step when scanning history backwards
+# history.jsonl past this size is renamed to history.jsonl.N and gzipped in the background
+HISTORY_ROTATE_BYTES = 8 << 20
+
+PATTERN_HISTORY = 100  # successful/failed patterns kept, oldest evicted first
+
+PLAN_CACHE_THRESHOLD = 0.90
+PLAN_CACHE_SIZE = 200
+
+
+def _goal_vector(text):
+    """
+    Unit-length bag-of-words vector used to compare goal descriptions.
+    Normalized once here so similarity is a plain sparse dot product.
+    """
+    counts = Counter(re.findall(r"[a-z0-9]+", text.lower()))
+    norm = math.sqrt(sum(c * c for c in counts.values()))
+    return {word: c / norm for word, c in counts.items()}
+
+
+def _cosine(a, b):
+    """Cosine similarity between two unit vectors from _goal_vector."""
+    if len(a) > len(b):
+        a, b = b, a
+    get = b.get
+    return sum(weight * get(word, 0.0) for word, weight in a.items())
 
 
 class Memory:
     """
     Persistent memory system for DevOS agent.
-    Stores: execution history, project registry, learned patterns, agent state.
+    Stores: execution history, project registry, learned patterns, cached plans,
+    agent state.
     All data is JSON-based and persisted to /ai/memory/.
     """
 
@@ -24,9 +85,25 @@ class Memory:
         self.history_file = os.path.join(memory_dir, "history.jsonl")
         self.projects_file = os.path.join(memory_dir, "projects.json")
         self.patterns_file = os.path.join(memory_dir, "patterns.json")
+        self.plans_file = os.path.join(memory_dir, "plans.json")
 
         os.makedirs(memory_dir, exist_ok=True)
 
+        # History entries are queued and written in batches by a flusher thread
+        self._pending = deque()
+        self._history_fp = None  # opened on first flush, kept open until close()
+        # Documents changed since their last save; persisted by the flusher
+        self._dirty = {"state": False, "projects": False, "patterns": False, "plans": False}
+        self._hashes = {}  # path -> digest of the last payload written there
+        self._flush_event = threading.Event()
+        self._flush_lock = threading.Lock()
+        # Held while documents are structurally changed or being encoded
+        self._data_lock = threading.Lock()
+
+        # Bumped on every mutation; keys the cached context summary
+        self._version = 0
+        self._summary_cache = (None, None)
+
         self.state = self._load_json(self.state_file, default={
             "boot_count": 0,
             "total_goals_completed": 0,
@@ -36,99 +113,295 @@ class Memory:
             "last_boot": None,
         })
         self.projects = self._load_json(self.projects_file, default={})
-        self.patterns = self._load_json(self.patterns_file, default={
-            "successful_patterns": [],
-            "failed_patterns": [],
-        })
+        patterns = self._load_json(self.patterns_file)
+        self.patterns = {
+            key: deque(patterns.get(key, ()), maxlen=PATTERN_HISTORY)
+            for key in ("successful_patterns", "failed_patterns")
+        }
+        self.plans = self._load_json(self.plans_file, default={"entries": []})
+        self._index_plans()
+        self._recent = deque(self._read_history(RECENT_HISTORY), maxlen=RECENT_HISTORY)
 
         # Update boot state
         self.state["boot_count"] += 1
         self.state["last_boot"] = time.time()
-        self._save_state()
+        self._dirty["state"] = True
+        self.flush()
 
         logging.info(f"MEMORY: Loaded. Boot #{self.state['boot_count']}, "
                      f"{self.state['total_goals_completed']} goals completed historically.")
 
+        self._flusher = threading.Thread(target=self._flush_loop, name="memory-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
     def _load_json(self, path, default=None):
         """Load a JSON file, returning default if not found."""
         try:
             if os.path.exists(path):
-                with open(path, 'r') as f:
-                    return json.load(f)
+                with open(path, 'rb') as f:
+                    return _loads(f.read())
         except (json.JSONDecodeError, IOError) as e:
             logging.warning(f"MEMORY: Failed to load {path}: {e}")
         return default if default is not None else {}
 
     def _save_json(self, path, data):
-        """Save data to a JSON file."""
+        """
+        Save data to a JSON file: encoded once, written with a single write to
+        a temp file and renamed over the target so a crash never leaves a
+        partial file. Skipped when the content is unchanged since the last save.
+        """
+        payload = _dumps_pretty(data)
+        digest = hashlib.blake2b(payload, digest_size=16).digest()
+        if self._hashes.get(path) == digest:
+            return
+        tmp = path + '.tmp'
         try:
-            with open(path, 'w') as f:
-                json.dump(data, f, indent=2)
+            with open(tmp, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp, path)
+            self._hashes[path] = digest
         except IOError as e:
             logging.error(f"MEMORY: Failed to save {path}: {e}")
 
-    def _save_state(self):
-        self._save_json(self.state_file, self.state)
+    def _save_dirty(self):
+        """Persist every document marked dirty (one write each, however many changes)."""
+        files = {
+            "state": (self.state_file, self.state),
+            "projects": (self.projects_file, self.projects),
+            "patterns": (self.patterns_file, self.patterns),
+            "plans": (self.plans_file, self.plans),
+        }
+        for key, dirty in self._dirty.items():
+            if dirty:
+                self._dirty[key] = False
+                path, data = files[key]
+                try:
+                    with self._data_lock:
+                        self._save_json(path, data)
+                except Exception:
+                    self._dirty[key] = True
+                    raise
 
     # --- History ---
 
     def record_action(self, action_type, details, success=True):
-        """Append an action to the history log (JSONL format)."""
+        """Queue an action for the history log (JSONL format)."""
         entry = {
             "timestamp": time.time(),
             "type": action_type,
             "details": details,
             "success": success,
         }
-        try:
-            with open(self.history_file, 'a') as f:
-                f.write(json.dumps(entry) + '\n')
-        except IOError as e:
-            logging.error(f"MEMORY: History write failed: {e}")
-
+        self._pending.append(entry)
+        self._recent.append(entry)
         self.state["total_commands_executed"] += 1
-        self._save_state()
+        self._dirty["state"] = True
+        self._version += 1
+        if len(self._pending) >= HISTORY_FLUSH_BATCH:
+            self._flush_event.set()
+
+    def flush(self):
+        """Write queued history entries and any changed documents to disk."""
+        with self._flush_lock:
+            if self._pending:
+                entries = []
+                while self._pending:
+                    entries.append(self._pending.popleft())
+                lines = []
+                for entry in entries:
+                    try:
+                        lines.append(_dumps_line(entry))
+                    except (TypeError, ValueError) as e:
+                        # Would fail on every retry, so drop it rather than block the queue
+                        logging.error(f"MEMORY: Dropping unserializable history entry: {e}")
+                try:
+                    if self._history_fp is None:
+                        self._history_fp = open(self.history_file, 'ab', buffering=1 << 16)
+                    self._history_fp.write(b''.join(lines))
+                    self._history_fp.flush()
+                except IOError as e:
+                    logging.error(f"MEMORY: History write failed, will retry: {e}")
+                    self._pending.extendleft(reversed(entries))
+                    self._discard_history_fp()
+                else:
+                    try:
+                        if self._history_fp.tell() > HISTORY_ROTATE_BYTES:
+                            self._rotate_history()
+                    except OSError as e:
+                        logging.error(f"MEMORY: History rotation failed: {e}")
+            self._save_dirty()
+
+    def close(self):
+        """Flush everything and release the history file handle."""
+        self.flush()
+        with self._flush_lock:
+            if self._history_fp is not None:
+                self._history_fp.close()
+                self._history_fp = None
+
+    def _discard_history_fp(self):
+        """Drop a handle that failed mid-write so the next flush reopens the file."""
+        try:
+            self._history_fp.close()
+        except (IOError, AttributeError):
+            pass
+        self._history_fp = None
+
+    def _rotate_history(self):
+        """Move the live history file aside as the next numbered segment and compress it."""
+        self._history_fp.close()
+        self._history_fp = None
+        numbers = [n for n, _ in self._history_segments()]
+        segment = f"{self.history_file}.{max(numbers, default=0) + 1}"
+        os.replace(self.history_file, segment)
+        threading.Thread(target=self._compress_segment, args=(segment,),
+                         name="memory-gzip", daemon=True).start()
+
+    @staticmethod
+    def _compress_segment(path):
+        """gzip a rotated segment; the plain file is removed only once the .gz is complete."""
+        try:
+            with open(path, 'rb') as src, gzip.open(path + '.gz.tmp', 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            os.replace(path + '.gz.tmp', path + '.gz')
+            os.remove(path)
+        except OSError as e:
+            logging.error(f"MEMORY: History compression failed: {e}")
+
+    def _history_segments(self):
+        """Rotated history segments as (number, path), newest first."""
+        prefix = os.path.basename(self.history_file) + '.'
+        segments = {}
+        for name in os.listdir(self.memory_dir):
+            if not name.startswith(prefix):
+                continue
+            number, _, ext = name[len(prefix):].partition('.')
+            if not number.isdigit() or ext not in ("", "gz"):
+                continue
+            # Until compression finishes the plain segment is the complete one
+            if ext == "" or int(number) not in segments:
+                segments[int(number)] = os.path.join(self.memory_dir, name)
+        return sorted(segments.items(), reverse=True)
+
+    def _flush_loop(self):
+        """Background flusher: every HISTORY_FLUSH_INTERVAL or when a batch fills."""
+        while True:
+            self._flush_event.wait(HISTORY_FLUSH_INTERVAL)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the flusher alive; queued entries stay pending for the next pass
+                logging.exception("MEMORY: Background flush failed")
 
     def get_recent_history(self, count=20):
         """Get the last N history entries."""
+        if 0 < count <= RECENT_HISTORY:
+            return list(self._recent)[-count:]
+        return self._read_history(count)
+
+    def _read_history(self, count):
+        """
+        Last N history entries as stored on disk (all of them if count <= 0),
+        reading only as many rotated segments as needed.
+
+        >>> import tempfile
+        >>> d = tempfile.mkdtemp()
+        >>> for name, n in (("history.jsonl.1", 4), ("history.jsonl.2", 3), ("history.jsonl", 2)):
+        ...     with open(os.path.join(d, name), "w") as f:
+        ...         _ = f.write("".join(json.dumps({"seg": name, "i": i}) + "\\n" for i in range(n)))
+        >>> m = Memory(d)
+        >>> [e["seg"][-2:] for e in m._read_history(5)]  # live + newest segment, exactly
+        ['.2', '.2', '.2', 'nl', 'nl']
+        >>> len(m._read_history(0))
+        9
+        >>> m.close()
+        """
+        self.flush()
         entries = []
+        lines = []
         try:
             if os.path.exists(self.history_file):
-                with open(self.history_file, 'r') as f:
-                    lines = f.readlines()
-                for line in lines[-count:]:
-                    try:
-                        entries.append(json.loads(line.strip()))
-                    except json.JSONDecodeError:
-                        continue
-        except IOError:
-            pass
+                lines = self._tail_lines(self.history_file, count)
+            # Continue into rotated segments when the live file is too short
+            for _, path in self._history_segments():
+                remaining = count - len(lines) if count > 0 else 0  # 0 = whole segment
+                if count > 0 and remaining <= 0:
+                    break
+                try:
+                    older = self._segment_lines(path, remaining)
+                except FileNotFoundError:
+                    # Compressed between listing and reading: the .gz is complete by now
+                    older = self._segment_lines(path + '.gz', remaining)
+                lines = older + lines
+        except IOError as e:
+            logging.error(f"MEMORY: History read stopped early: {e}")
+        for line in lines:
+            try:
+                entries.append(_loads(line))
+            except ValueError:  # bad JSON or bad UTF-8
+                continue
         return entries
 
+    @classmethod
+    def _segment_lines(cls, path, count):
+        """Last `count` lines of a rotated segment (all lines if count <= 0)."""
+        if not path.endswith('.gz'):
+            return cls._tail_lines(path, count)
+        with gzip.open(path, 'rb') as f:
+            lines = f.read().split(b'\n')
+        if lines and not lines[-1]:
+            lines.pop()
+        return lines[-count:] if count > 0 else lines
+
+    @staticmethod
+    def _tail_lines(path, count):
+        """
+        Last `count` lines of a file, read backwards in HISTORY_TAIL_CHUNK
+        steps so the cost depends on `count`, not on the file size.
+        """
+        with open(path, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            buf = b''
+            # count + 1 newlines guarantee the first wanted line is complete
+            while pos > 0 and (count <= 0 or buf.count(b'\n') <= count):
+                step = min(HISTORY_TAIL_CHUNK, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+        lines = buf.split(b'\n')
+        if lines and not lines[-1]:
+            lines.pop()  # the file ends with a newline
+        return lines[-count:] if count > 0 else lines
+
     # --- Project Registry ---
 
     def register_project(self, name, path, description="", language="python"):
         """Register a project in the memory."""
-        self.projects[name] = {
-            "path": path,
-            "description": description,
-            "language": language,
-            "created": time.time(),
-            "last_modified": time.time(),
-            "commit_count": 0,
-            "test_pass": None,
-        }
-        self.state["last_active_project"] = name
-        self._save_json(self.projects_file, self.projects)
-        self._save_state()
+        with self._data_lock:
+            self.projects[name] = {
+                "path": path,
+                "description": description,
+                "language": language,
+                "created": time.time(),
+                "last_modified": time.time(),
+                "commit_count": 0,
+                "test_pass": None,
+            }
+            self.state["last_active_project"] = name
+        self._version += 1
+        self._dirty["projects"] = self._dirty["state"] = True
         logging.info(f"MEMORY: Registered project '{name}' at {path}")
 
     def update_project(self, name, **kwargs):
         """Update project metadata."""
         if name in self.projects:
-            self.projects[name].update(kwargs)
-            self.projects[name]["last_modified"] = time.time()
-            self._save_json(self.projects_file, self.projects)
+            with self._data_lock:
+                self.projects[name].update(kwargs)
+                self.projects[name]["last_modified"] = time.time()
+            self._version += 1
+            self._dirty["projects"] = True
 
     def get_project(self, name):
         """Get project info by name."""
@@ -146,37 +419,111 @@ class Memory:
 
     def record_success(self, goal_description, approach):
         """Record a successful approach for future reference."""
-        self.patterns["successful_patterns"].append({
-            "goal": goal_description,
-            "approach": approach,
-            "timestamp": time.time(),
-        })
-        # Keep only last 100 patterns
-        self.patterns["successful_patterns"] = self.patterns["successful_patterns"][-100:]
-        self._save_json(self.patterns_file, self.patterns)
+        with self._data_lock:
+            self.patterns["successful_patterns"].append({
+                "goal": goal_description,
+                "approach": approach,
+                "timestamp": time.time(),
+            })
         self.state["total_goals_completed"] += 1
-        self._save_state()
+        self._version += 1
+        self._dirty["patterns"] = self._dirty["state"] = True
 
     def record_failure(self, goal_description, approach, error):
         """Record a failed approach to avoid repeating."""
-        self.patterns["failed_patterns"].append({
-            "goal": goal_description,
-            "approach": approach,
-            "error": str(error)[:500],
-            "timestamp": time.time(),
-        })
-        self.patterns["failed_patterns"] = self.patterns["failed_patterns"][-100:]
-        self._save_json(self.patterns_file, self.patterns)
+        with self._data_lock:
+            self.patterns["failed_patterns"].append({
+                "goal": goal_description,
+                "approach": approach,
+                "error": str(error)[:500],
+                "timestamp": time.time(),
+            })
         self.state["total_goals_failed"] += 1
-        self._save_state()
+        self._version += 1
+        self._dirty["patterns"] = self._dirty["state"] = True
 
     def get_successful_patterns(self):
         """Get recorded successful patterns."""
-        return self.patterns.get("successful_patterns", [])
+        return list(self.patterns["successful_patterns"])
 
     def get_failed_patterns(self):
         """Get recorded failed patterns."""
-        return self.patterns.get("failed_patterns", [])
+        return list(self.patterns["failed_patterns"])
+
+    def record_template_result(self, name, success):
+        """Count a pipeline pass/fail for a project template."""
+        with self._data_lock:
+            stats = self.state.setdefault("template_stats", {})
+            ok, fail = stats.get(name, (0, 0))
+            stats[name] = [ok + 1, fail] if success else [ok, fail + 1]
+        self._dirty["state"] = True
+
+    def get_template_stats(self):
+        """Get {template_name: [ok, fail]} pipeline counters."""
+        return self.state.get("template_stats", {})
+
+    def recent_inputs(self, count=5, scan=50):
+        """Get the last operator inputs from recent history."""
+        inputs = [
+            str(entry.get("details", ""))
+            for entry in self.get_recent_history(scan)
+            if entry.get("type") == "operator_input"
+        ]
+        return inputs[-count:]
+
+    # --- Plan Cache ---
+
+    def lookup_plan(self, goal_description, threshold=PLAN_CACHE_THRESHOLD):
+        """
+        Find a cached plan for a similar goal.
+        Returns the plan dict of the closest match above threshold, or None.
+        """
+        query = _goal_vector(goal_description)
+
+        # Only entries sharing at least one word can have a non-zero score
+        candidates = set()
+        for word in query:
+            candidates.update(self._plan_postings.get(word, ()))
+
+        best_score, best_index = 0.0, None
+        for i in sorted(candidates):
+            score = _cosine(query, self._plan_vectors[i])
+            if score > best_score:
+                best_score, best_index = score, i
+        if best_index is None or best_score < threshold:
+            return None
+        entry = self.plans["entries"][best_index]
+        logging.info(f"MEMORY: Plan cache hit ({best_score:.2f}): '{entry['goal']}'")
+        return entry["plan"]
+
+    def cache_plan(self, goal_description, plan):
+        """Store the plan that completed a goal so similar goals can reuse it."""
+        if not isinstance(plan, dict) or not isinstance(plan.get("files"), dict):
+            return
+        entries = self.plans["entries"]
+        with self._data_lock:
+            for i, entry in enumerate(entries):
+                if entry["goal"] == goal_description:
+                    del entries[i]
+                    break
+            entries.append({
+                "goal": goal_description,
+                "plan": plan,
+                "timestamp": time.time(),
+            })
+            # Keep only the most recent plans
+            if len(entries) > PLAN_CACHE_SIZE:
+                del entries[:-PLAN_CACHE_SIZE]
+        self._index_plans()
+        self._dirty["plans"] = True
+
+    def _index_plans(self):
+        """Rebuild goal vectors and the word -> entry postings for the plan cache."""
+        self._plan_vectors = [_goal_vector(e["goal"]) for e in self.plans["entries"]]
+        self._plan_postings = {}
+        for i, vector in enumerate(self._plan_vectors):
+            for word in vector:
+                self._plan_postings.setdefault(word, []).append(i)
 
     # --- Context for LLM ---
 
@@ -184,7 +531,12 @@ class Memory:
         """
         Generate a summary string suitable for including in LLM context.
         Provides the agent with awareness of past work.
+        Cached until the next write to memory.
         """
+        version, summary = self._summary_cache
+        if version == self._version:
+            return summary
+
         lines = []
         lines.append(f"Boot #{self.state['boot_count']}")
         lines.append(f"Goals completed: {self.state['total_goals_completed']}")
@@ -205,4 +557,6 @@ class Memory:
                 status = "OK" if entry.get("success") else "FAIL"
                 lines.append(f"  [{status}] {entry.get('type', '?')}: {str(entry.get('details', ''))[:80]}")
 
-        return '\n'.join(lines)
+        summary = '\n'.join(lines)
+        self._summary_cache = (self._version, summary)
+        return summary
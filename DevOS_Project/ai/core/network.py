@@ -1,8 +1,11 @@
 
 import os
+import re
 import logging
+import shlex
 import subprocess
 import time
+from collections import deque
 
 class NetworkManager:
     """
@@ -28,6 +31,8 @@ class NetworkManager:
         "wget",
         "apk add",
     ]
+    # Leading whitespace, then any allowed operation as a case-insensitive prefix
+    _OPERATION_RE = re.compile(r"\s*(?:%s)" % "|".join(map(re.escape, ALLOWED_OPERATIONS)), re.IGNORECASE)
 
     BLOCKED_DOMAINS = [
         "facebook.com",
@@ -35,27 +40,29 @@ class NetworkManager:
         "instagram.com",
         "tiktok.com",
     ]
+    _BLOCKED_DOMAIN_RE = re.compile("|".join(map(re.escape, BLOCKED_DOMAINS)))
 
     def __init__(self):
         self.network_up = False
-        self.access_log = []
+        self.access_log = deque(maxlen=100)  # oldest entries drop off automatically
 
     def is_network_operation(self, command):
         """Check if a command requires network access."""
-        cmd_lower = command.lower().strip()
-        return any(cmd_lower.startswith(op) for op in self.ALLOWED_OPERATIONS)
+        return self._OPERATION_RE.match(command) is not None
 
     def execute_with_network(self, command, cwd=None, timeout=120):
         """
         Execute a command that requires network.
         Opens network, runs command, closes network.
+        `command` is an argv list or a string split with shlex (no shell).
         """
-        if not self.is_network_operation(command):
-            logging.warning(f"NET: Not a network operation: {command[:50]}")
+        cmd_str = command if isinstance(command, str) else shlex.join(command)
+        if not self.is_network_operation(cmd_str):
+            logging.warning(f"NET: Not a network operation: {cmd_str[:50]}")
             return self._run(command, cwd, timeout)
 
-        logging.info(f"NET: Opening network for: {command[:80]}")
-        self._log_access(command, "open")
+        logging.info(f"NET: Opening network for: {cmd_str[:80]}")
+        self._log_access(cmd_str, "open")
 
         try:
             self._enable_network()
@@ -63,26 +70,26 @@ class NetworkManager:
             return result
         finally:
             self._disable_network()
-            self._log_access(command, "close")
+            self._log_access(cmd_str, "close")
             logging.info("NET: Network closed.")
 
     def pip_install(self, packages, cwd=None):
         """Install Python packages via pip."""
-        if isinstance(packages, list):
-            packages = " ".join(packages)
+        if isinstance(packages, str):
+            packages = shlex.split(packages)
 
-        logging.info(f"NET: pip install {packages}")
+        logging.info(f"NET: pip install {' '.join(packages)}")
         return self.execute_with_network(
-            f"pip3 install --no-cache-dir {packages}",
+            ["pip3", "install", "--no-cache-dir", *packages],
             cwd=cwd,
             timeout=180
         )
 
     def git_clone(self, url, dest=None, cwd=None):
         """Clone a git repository."""
-        cmd = f"git clone --depth 1 {url}"
+        cmd = ["git", "clone", "--depth", "1", url]
         if dest:
-            cmd += f" {dest}"
+            cmd.append(dest)
 
         logging.info(f"NET: git clone {url}")
         return self.execute_with_network(cmd, cwd=cwd, timeout=300)
@@ -90,24 +97,25 @@ class NetworkManager:
     def download_file(self, url, output_path):
         """Download a file."""
         # Block certain domains
-        for domain in self.BLOCKED_DOMAINS:
-            if domain in url:
-                logging.warning(f"NET: Blocked domain: {domain}")
-                return f"ERROR: Domain blocked: {domain}"
+        blocked = self._BLOCKED_DOMAIN_RE.search(url)
+        if blocked:
+            domain = blocked.group()
+            logging.warning(f"NET: Blocked domain: {domain}")
+            return f"ERROR: Domain blocked: {domain}"
 
         logging.info(f"NET: Download {url}")
         return self.execute_with_network(
-            f"curl -sL -o {output_path} {url}",
+            ["curl", "-sL", "-o", output_path, url],
             timeout=120
         )
 
     def _enable_network(self):
         """Enable network interfaces."""
         try:
-            # Try to bring up network interface
-            self._run("ip link set eth0 up 2>/dev/null", timeout=5)
+            # Try to bring up network interface (stderr is captured, not shown)
+            self._run(["ip", "link", "set", "eth0", "up"], timeout=5)
             # Try DHCP
-            self._run("udhcpc -i eth0 -q 2>/dev/null", timeout=15)
+            self._run(["udhcpc", "-i", "eth0", "-q"], timeout=15)
             self.network_up = True
         except Exception as e:
             logging.warning(f"NET: Could not enable network: {e}")
@@ -124,10 +132,14 @@ class NetworkManager:
             pass
 
     def _run(self, command, cwd=None, timeout=60):
-        """Execute a command."""
+        """
+        Execute a command directly, without a shell: no extra /bin/sh process,
+        and URLs or paths cannot inject shell syntax.
+        """
+        args = shlex.split(command) if isinstance(command, str) else command
         try:
             result = subprocess.run(
-                command, shell=True, cwd=cwd,
+                args, cwd=cwd,
                 capture_output=True, text=True, timeout=timeout
             )
             if result.returncode == 0:
@@ -146,12 +158,10 @@ class NetworkManager:
             "action": action,
         }
         self.access_log.append(entry)
-        # Keep only last 100 entries
-        self.access_log = self.access_log[-100:]
 
     def get_access_log(self):
         """Return network access log."""
-        return self.access_log
+        return list(self.access_log)
 
     def install_requirements(self, project_path):
         """Auto-detect and install project requirements."""
@@ -159,7 +169,7 @@ class NetworkManager:
         if os.path.exists(req_file):
             logging.info(f"NET: Installing from requirements.txt")
             return self.execute_with_network(
-                f"pip3 install --no-cache-dir -r {req_file}",
+                ["pip3", "install", "--no-cache-dir", "-r", req_file],
                 cwd=project_path, timeout=300
             )
 
@@ -167,7 +177,7 @@ class NetworkManager:
         if os.path.exists(setup_file):
             logging.info(f"NET: Installing from setup.py")
             return self.execute_with_network(
-                "pip3 install -e .",
+                ["pip3", "install", "-e", "."],
                 cwd=project_path, timeout=300
             )
 
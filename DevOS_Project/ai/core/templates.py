@@ -4,6 +4,8 @@ Advanced project templates for autonomous generation.
 Each template produces a complete, tested, multi-file project.
 """
 
+from types import MappingProxyType
+
 TEMPLATES_SYSTEM = [
     {
         "name": "process_monitor",
@@ -696,3 +698,6 @@ if __name__ == "__main__":
         "test_cmd": "python3 -m unittest test_transformer.py -v"
     },
 ]
+
+# Shared read-only views; copy before mutating
+TEMPLATES_SYSTEM = [MappingProxyType(t) for t in TEMPLATES_SYSTEM]
@@ -4,8 +4,13 @@ import subprocess
 import logging
 import json
 import shutil
+import time
+import selectors
+from collections import deque
 
 PROJECTS_DIR = "/projects"
+# Per-stream cap on captured command output; only the tail is kept
+MAX_CAPTURE_BYTES = 64 * 1024
 LOGS_DIR = "/logs"
 FORBIDDEN_COMMANDS = [
     "rm -rf /",
@@ -42,23 +47,24 @@ def run_command(command, cwd=None, timeout=60):
 
     logging.info(f"EXEC: {command}")
     try:
-        result = subprocess.run(
+        proc = subprocess.Popen(
             command,
             cwd=cwd,
             shell=True,
-            capture_output=True,
-            text=True,
-            timeout=timeout
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
         )
-        if result.returncode == 0:
-            output = result.stdout.strip()
+        stdout, stderr = _drain(proc, timeout)
+        if proc.returncode == 0:
+            output = stdout.strip()
             if output:
                 logging.info(f"OK: {output[:200]}")
-            return result.stdout
+            return stdout
         else:
-            err = result.stderr.strip()
-            logging.error(f"FAIL [{result.returncode}]: {err[:200]}")
-            return f"ERROR [{result.returncode}]: {err}"
+            err = stderr.strip()
+            logging.error(f"FAIL [{proc.returncode}]: {err[:200]}")
+            return f"ERROR [{proc.returncode}]: {err}"
     except subprocess.TimeoutExpired:
         logging.error(f"TIMEOUT: Command exceeded {timeout}s")
         return f"ERROR: Command timed out after {timeout}s"
@@ -67,6 +73,46 @@ def run_command(command, cwd=None, timeout=60):
         return f"ERROR: {str(e)}"
 
 
+def _drain(proc, timeout):
+    """
+    Reads stdout and stderr of a running process until both close, keeping
+    only the last MAX_CAPTURE_BYTES of each. Output past the cap is still
+    read (so the child never blocks on a full pipe) but dropped.
+    Raises subprocess.TimeoutExpired after killing the process.
+    """
+    deadline = time.monotonic() + timeout
+    chunks = {proc.stdout: deque(), proc.stderr: deque()}
+    sizes = {proc.stdout: 0, proc.stderr: 0}
+    try:
+        with selectors.DefaultSelector() as sel:
+            for pipe in chunks:
+                sel.register(pipe, selectors.EVENT_READ)
+            while sel.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise subprocess.TimeoutExpired(proc.args, timeout)
+                for key, _ in sel.select(remaining):
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        sel.unregister(key.fileobj)
+                        key.fileobj.close()
+                        continue
+                    buf = chunks[key.fileobj]
+                    buf.append(data)
+                    sizes[key.fileobj] += len(data)
+                    while sizes[key.fileobj] - len(buf[0]) >= MAX_CAPTURE_BYTES:
+                        sizes[key.fileobj] -= len(buf.popleft())
+        proc.wait(max(0, deadline - time.monotonic()))
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    return tuple(
+        b"".join(chunks[pipe])[-MAX_CAPTURE_BYTES:].decode(errors="replace")
+        for pipe in (proc.stdout, proc.stderr)
+    )
+
+
 def write_file(path, content):
     """Writes content to a file, creating parent directories if needed."""
     logging.info(f"WRITE: {path}")
@@ -81,6 +127,29 @@ def write_file(path, content):
         return f"ERROR: {str(e)}"
 
 
+def write_files(files, buffering=1 << 20):
+    """
+    Writes several files in one pass: each parent directory is created once
+    and every file goes out through a single large buffered write.
+    `files` is a list of (path, content) pairs.
+    """
+    written, dirs_made = 0, set()
+    try:
+        for path, content in files:
+            parent = os.path.dirname(path)
+            if parent not in dirs_made:
+                os.makedirs(parent, exist_ok=True)
+                dirs_made.add(parent)
+            with open(path, 'w', buffering=buffering) as f:
+                f.write(content)
+            written += 1
+        logging.info(f"WRITTEN: {written} files")
+        return f"OK: Written {written} files"
+    except Exception as e:
+        logging.error(f"WRITE ERROR: {str(e)}")
+        return f"ERROR: {str(e)}"
+
+
 def read_file(path):
     """Reads and returns file contents."""
     logging.info(f"READ: {path}")